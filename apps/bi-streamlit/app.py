@@ -1,23 +1,51 @@
-"""Main Streamlit page (map + focus cards for Ariège weather)."""
+"""Main Streamlit page (map + focus cards for the selected area's weather)."""
 
 from __future__ import annotations
 
+from datetime import datetime, timedelta
+
 import streamlit as st
 import pydeck as pdk
 
 from layers import (
+    GRID_ZOOMS,
     build_station_scatter_layer,
     build_icon_layer,
+    cluster_focus,
+    cluster_stations,
     compute_view_state,
     freshness_badge,
     build_focus_cards,
+    build_zone_options,
+    melt_focus_flags,
+    picked_station,
+)
+from data import (
+    data_version,
+    format_last_update,
+    load_departments,
+    load_latest_station_metrics,
+    load_latest_timestamp,
+    load_station_grid,
+    load_station_series,
 )
-from data import format_last_update, load_latest_station_metrics, load_latest_timestamp
+
+
+DEFAULT_ZONE = "Ariège (09)"
+SERIES_RANGES = {"24 h": 1, "7 jours": 7, "30 jours": 30}
+
+
+@st.cache_data(max_entries=32, show_spinner=False)
+def load_focus_view(version: str | None, depts: tuple[str, ...]):
+    """Melted focus points + cards HTML, built once per data version and area."""
+    focus = melt_focus_flags(load_latest_station_metrics(version, depts))
+    cards_html, focus_titles = build_focus_cards(focus)
+    return focus, cards_html, focus_titles
 
 
 def main() -> None:
     """Render the main page: freshness header, focus cards, PyDeck map."""
-    st.set_page_config(page_title="Radar des spots météo en Ariège", layout="wide")
+    st.set_page_config(page_title="Radar des spots météo", layout="wide")
 
     st.markdown(
         """
@@ -107,24 +135,35 @@ def main() -> None:
         unsafe_allow_html=True,
     )
 
-    # Chargement des données
-    max_ts = load_latest_timestamp()
+    # Zone affichée : seules ses partitions / lignes sont lues
+    version = data_version()
+    zones = build_zone_options(load_departments(version))
+    zone_labels = list(zones)
+    zone = None
+    if zone_labels:
+        default = zone_labels.index(DEFAULT_ZONE) if DEFAULT_ZONE in zones else 0
+        zone = st.selectbox("Zone", zone_labels, index=default)
+    depts = zones.get(zone, ())
+
+    # Chargement des données (un seul frame, rechargé quand la version change)
+    latest = load_latest_station_metrics(version, depts)
+    max_ts = load_latest_timestamp(latest)
     subtitle = format_last_update(max_ts)
-    latest = load_latest_station_metrics()
 
     # HEADER
     label, color = freshness_badge(max_ts)
+    title = "Radar des spots météo" + (f" — {zone}" if zone else "")
 
     st.markdown(
         f'<div class="hero-header">'
-        f'<div class="hero-title">Radar des spots météo en Ariège</div>'
+        f'<div class="hero-title">{title}</div>'
         f'<span class="hero-badge" style="background:{color};">{label}</span>'
         f"</div>",
         unsafe_allow_html=True,
     )
     st.caption(subtitle)
 
-    cards_html, map_options = build_focus_cards(latest)
+    focus, cards_html, options_labels = load_focus_view(version, depts)
 
     tabs = st.tabs(["Synthèse", "Carte"])
     with tabs[0]:
@@ -151,7 +190,6 @@ def main() -> None:
             if not latest.empty
             else latest
         )
-        options_labels = [label for label, _, _ in map_options]
         selected = st.pills(
             "Spots à afficher",
             options_labels,
@@ -160,19 +198,67 @@ def main() -> None:
             label_visibility="collapsed",
         )
 
-        layers = [build_station_scatter_layer(stations)]
-        for label, df_points, icon_url in map_options:
-            if label in selected:
-                layer = build_icon_layer(df_points, icon_url, 28)
-                if layer:
-                    layers.append(layer)
-        st.pydeck_chart(
+        # Zoom choisi côté serveur : stations de la zone regroupées par
+        # cellule de grille (un point par cellule)
+        zoom = st.select_slider(
+            "Zoom",
+            options=list(GRID_ZOOMS),
+            value=compute_view_state(stations).zoom,
+        )
+        view_state = compute_view_state(stations, zoom=zoom)
+        grid = load_station_grid(version, depts)
+        station_points = cluster_stations(grid, stations.get("station_id", []), zoom)
+
+        layers = [build_station_scatter_layer(station_points)]
+        icon_layer = build_icon_layer(cluster_focus(focus, grid, zoom), selected, 28)
+        if icon_layer:
+            layers.append(icon_layer)
+        # Clic sur une station : drilldown sur son historique horaire
+        event = st.pydeck_chart(
             pdk.Deck(
                 layers=layers,
-                initial_view_state=compute_view_state(stations),
+                initial_view_state=view_state,
                 tooltip={"text": "{station_name}\n{status}\n(lat: {lat}, lon: {lon})"},
-            )
+            ),
+            on_select="rerun",
+            selection_mode="single-object",
         )
+        clicked = picked_station(event.selection) if event else None
+        if clicked and max_ts is not None:
+            render_station_drilldown(version, stations, clicked, max_ts)
+
+
+def render_station_drilldown(
+    version: str | None, stations, station_id: str, max_ts: datetime
+) -> None:
+    """Hourly history of one station (lazy read, LRU-cached per data version)."""
+    names = dict(zip(stations["station_id"], stations["station_name"]))
+    ids = list(names)
+    col_station, col_range = st.columns([3, 2])
+    with col_station:
+        station_id = st.selectbox(
+            "Station",
+            ids,
+            index=ids.index(station_id) if station_id in ids else 0,
+            format_func=lambda sid: f"{names[sid]} ({sid})",
+        )
+    with col_range:
+        days = SERIES_RANGES[
+            st.segmented_control("Période", list(SERIES_RANGES), default="24 h")
+            or "24 h"
+        ]
+
+    # Bornes alignées sur la dernière heure du mart : clé de cache stable
+    series = load_station_series(
+        station_id, max_ts - timedelta(days=days), max_ts, version
+    )
+    if series.empty:
+        st.info("Pas d'historique pour cette station sur la période.")
+        return
+    series = series.set_index("validity_time_utc")
+    st.line_chart(series[["temperature_c", "temp_24h_c"]], y_label="°C")
+    st.bar_chart(series[["precip_mm_h"]], y_label="mm/h")
+    st.line_chart(series[["wind_speed_kmh"]], y_label="km/h")
 
 
 if __name__ == "__main__":
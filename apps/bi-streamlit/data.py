@@ -1,38 +1,269 @@
-"""Read marts from DuckDB for the Streamlit dashboard."""
+"""Read marts for the Streamlit dashboard.
 
+The app reads the Arrow snapshot published at the end of the pipeline
+(`scripts/serving/publish_snapshot.py`), memory-mapped, so it never touches
+the DuckDB file locked by `dbt build` and the ingestion. Without a published
+snapshot (fresh clone, demo warehouse), it falls back to DuckDB read-only.
+
+Reads are scoped to the selected area: only the needed columns are read, and
+the `dept_code` filter prunes snapshot partitions (or is pushed into the
+DuckDB query), so load time follows the area size, not the whole country.
+
+The per-station history (drilldown) is read lazily: only the monthly Parquet
+files overlapping the requested range, pruned to the station's row groups.
+"""
+
+import functools
+import json
 import os
-from datetime import datetime
+from datetime import datetime, timedelta
+from pathlib import Path
 
 import duckdb
 import pandas as pd
+import pyarrow as pa
+import pyarrow.dataset as ds
 import streamlit as st
+from config import FLAG_DICT
+from pyarrow import fs
 
 DB_PATH = os.getenv("DUCKDB_PATH", "data/warehouse.duckdb")
+SERVING_PATH = os.getenv("SERVING_PATH", "data/serving")
+
+LATEST_TABLE = "marts.agg_station_latest_24h"
+GRID_TABLE = "marts.dim_station_grid"
+DEPARTMENTS_TABLE = "marts.dim_departments"
+SERIES_TABLE = "marts.fct_obs_hourly"
+SERIES_DIR = "series"
+
+# Colonnes du mart lues par l'app (projection poussée à la lecture)
+LATEST_COLUMNS = [
+    "station_id",
+    "dept_code",
+    "station_name",
+    "latitude",
+    "longitude",
+    "validity_time_utc",
+    *FLAG_DICT,
+]
+
+# Colonnes de l'historique servi (scripts/serving/publish_snapshot.py)
+SERIES_COLUMNS = [
+    "station_id",
+    "validity_time_utc",
+    "temperature_c",
+    "temp_24h_c",
+    "precip_mm_h",
+    "precip_24h_mm",
+    "snow_depth_m",
+    "wind_speed_kmh",
+    "wind_sector",
+    "humidity_pct",
+]
+# Séries (station, plage) gardées en mémoire par processus
+SERIES_CACHE_SIZE = 256
+
+
+def data_version() -> str | None:
+    """Marqueur de version des données : une lecture de fichier, aucune requête.
+
+    Nom de la version pointée par `CURRENT` (snapshot publié) ; à défaut, date
+    de modification du fichier DuckDB. None si aucune donnée n'est disponible.
+    """
+    try:
+        return "snapshot:" + (Path(SERVING_PATH) / "CURRENT").read_text().strip()
+    except FileNotFoundError:
+        pass
+    try:
+        return f"duckdb:{os.stat(DB_PATH).st_mtime_ns}"
+    except FileNotFoundError:
+        return None
+
+
+def _snapshot_partition(table: str, version_name: str) -> str | None:
+    """Colonne de partition Hive de `table` dans la version (manifest), ou None."""
+    manifest = json.loads(
+        (Path(SERVING_PATH) / version_name / "manifest.json").read_text()
+    )
+    return manifest["tables"].get(table, {}).get("partition")
+
+
+def _snapshot_path(table: str, version_name: str) -> Path:
+    """Fichier Arrow (ou répertoire partitionné) de `table` dans la version."""
+    base = Path(SERVING_PATH) / version_name
+    return base / table if (base / table).is_dir() else base / f"{table}.arrow"
+
+
+def _read_table(
+    table: str,
+    version: str,
+    columns: list[str] | None = None,
+    depts: tuple[str, ...] | None = None,
+) -> pd.DataFrame:
+    """Table servie pour `version` : snapshot Arrow memory-mappé, ou DuckDB.
+
+    `columns` et `depts` (filtre sur dept_code) sont appliqués à la lecture :
+    élagage des partitions du snapshot (tables partitionnées à la publication,
+    cf. manifest), ou clauses poussées dans la requête.
+    """
+    kind, _, name = version.partition(":")
+    if kind == "snapshot":
+        column = _snapshot_partition(table, name)
+        partitioning = (
+            ds.partitioning(pa.schema([(column, pa.string())]), flavor="hive")
+            if column
+            else None
+        )
+        dataset = ds.dataset(
+            str(_snapshot_path(table, name)),
+            format="ipc",
+            filesystem=fs.LocalFileSystem(use_mmap=True),
+            partitioning=partitioning,
+        )
+        # Snapshot publié avant l'ajout de dept_code à la table : lecture entière
+        where = (
+            ds.field("dept_code").isin(list(depts))
+            if depts and "dept_code" in dataset.schema.names
+            else None
+        )
+        return dataset.to_table(columns=columns, filter=where).to_pandas()
+
+    select = ", ".join(columns) if columns else "*"
+    query = f"select {select} from {table}"
+    params: dict = {}
+    if depts:
+        query += " where dept_code in (select unnest($depts))"
+        params["depts"] = list(depts)
+    with duckdb.connect(DB_PATH, read_only=True) as con:
+        return con.execute(query, params).df()
+
 
+# Clé de cache = (version des données, zone) : rechargement uniquement quand le
+# pipeline publie ou que la zone change, partagé par toutes les sessions
+@st.cache_data(max_entries=32, show_spinner=False)
+def _load_latest(version: str | None, depts: tuple[str, ...]) -> pd.DataFrame:
+    if version is None:
+        return pd.DataFrame(columns=LATEST_COLUMNS)
+    return _read_table(LATEST_TABLE, version, LATEST_COLUMNS, depts)
+
+
+def load_latest_station_metrics(
+    version: str | None = None, depts: tuple[str, ...] = ()
+) -> pd.DataFrame:
+    """Dernière observation par station, enrichie des labels BI (vue agg_station_latest_24h).
+
+    `version` : marqueur déjà lu par l'appelant (défaut : lu ici) ;
+    `depts` : codes département de la zone affichée (vide = tous).
+    """
+    version = version if version is not None else data_version()
+    return _load_latest(version, tuple(sorted(depts)))
+
+
+@st.cache_data(max_entries=2, show_spinner=False)
+def load_departments(version: str | None) -> pd.DataFrame:
+    """Départements ayant des stations dans le mart, avec nom et région."""
+    if version is None:
+        return pd.DataFrame(columns=["dept_code", "dept_name", "region_name"])
+    departments = _read_table(DEPARTMENTS_TABLE, version)
+    codes = _read_table(LATEST_TABLE, version, ["dept_code"])["dept_code"]
+    return departments[departments["dept_code"].isin(codes.unique())]
+
+
+@st.cache_data(max_entries=32, show_spinner=False)
+def _load_grid(version: str | None, depts: tuple[str, ...]) -> pd.DataFrame:
+    if version is None:
+        return pd.DataFrame()
+    return _read_table(GRID_TABLE, version, depts=depts)
+
+
+def load_station_grid(version: str | None, depts: tuple[str, ...] = ()) -> pd.DataFrame:
+    """Index de grille des stations par zoom (dim_station_grid), pour la carte.
+
+    `depts` : codes département de la zone affichée (vide = tous) ; seules les
+    partitions de la zone sont lues.
+    """
+    return _load_grid(version, tuple(sorted(depts)))
+
+
+def _series_files(version_name: str, start: datetime, end: datetime) -> list[str]:
+    """Fichiers mensuels de l'historique qui recoupent [start, end]."""
+    base = Path(SERVING_PATH) / version_name / SERIES_DIR
+    files = []
+    month = datetime(start.year, start.month, 1)
+    while month <= datetime(end.year, end.month, 1):
+        path = base / f"month={month:%Y-%m}" / "part-0.parquet"
+        if path.exists():
+            files.append(str(path))
+        month = (month + timedelta(days=32)).replace(day=1)
+    return files
+
+
+# LRU par processus, clé = (version, station, plage) : une nouvelle publication
+# change la clé, les anciennes entrées sortent par éviction
+@functools.lru_cache(maxsize=SERIES_CACHE_SIZE)
+def _load_series(
+    version: str, station_id: str, start: datetime, end: datetime
+) -> pd.DataFrame:
+    kind, _, name = version.partition(":")
+    if kind == "snapshot":
+        files = _series_files(name, start, end)
+        if not files:
+            return pd.DataFrame(columns=SERIES_COLUMNS)
+        dataset = ds.dataset(
+            files, format="parquet", filesystem=fs.LocalFileSystem(use_mmap=True)
+        )
+        # Filtre sur la colonne de tri : seuls les row groups de la station sont lus
+        ts = ds.field("validity_time_utc")
+        utc = pa.timestamp("us", "UTC")
+        where = (
+            (ds.field("station_id") == station_id)
+            & (ts >= pa.scalar(start, utc))
+            & (ts <= pa.scalar(end, utc))
+        )
+        table = dataset.to_table(columns=SERIES_COLUMNS, filter=where)
+        return table.sort_by("validity_time_utc").to_pandas()
 
-@st.cache_data(ttl=60)
-def load_latest_station_metrics() -> pd.DataFrame:
-    """Dernière observation par station, enrichie des labels BI (vue agg_station_latest_24h)."""
     with duckdb.connect(DB_PATH, read_only=True) as con:
         return con.execute(
-            """
-            select *
-            from marts.agg_station_latest_24h
-            """
+            f"""
+            select {", ".join(SERIES_COLUMNS)} from {SERIES_TABLE}
+            where station_id = $station_id
+              and validity_time_utc between $start and $end
+            order by validity_time_utc
+            """,
+            {"station_id": station_id, "start": start, "end": end},
         ).df()
 
 
-@st.cache_data(ttl=60)
-def load_latest_timestamp() -> datetime | None:
-    """Horodatage le plus récent disponible dans le mart agg_station_latest_24h."""
-    with duckdb.connect(DB_PATH, read_only=True) as con:
-        result = con.execute(
-            """
-            select max(validity_time_utc) as max_ts
-            from marts.agg_station_latest_24h
-            """
-        ).fetchone()
-    return result[0] if result else None
+def load_station_series(
+    station_id: str,
+    start: datetime,
+    end: datetime,
+    version: str | None = None,
+) -> pd.DataFrame:
+    """Historique horaire d'une station sur [start, end] (vue fct_obs_hourly).
+
+    Lecture à la demande, mise en cache LRU par (version, station, plage) :
+    passer des bornes UTC stables (ex. alignées sur la dernière heure) pour
+    réutiliser le cache d'un clic à l'autre. Le frame renvoyé est une copie.
+    """
+    version = version if version is not None else data_version()
+    if version is None:
+        return pd.DataFrame(columns=SERIES_COLUMNS)
+    return _load_series(version, station_id, start, end).copy()
+
+
+def load_latest_timestamp(latest: pd.DataFrame | None = None) -> datetime | None:
+    """Horodatage le plus récent du mart agg_station_latest_24h.
+
+    Calculé sur le frame déjà chargé (passé par l'appelant ou lu en cache).
+    """
+    if latest is None:
+        latest = load_latest_station_metrics()
+    if latest.empty:
+        return None
+    max_ts = latest["validity_time_utc"].max()
+    return None if pd.isna(max_ts) else max_ts.to_pydatetime()
 
 
 def format_last_update(ts: datetime | None) -> str:
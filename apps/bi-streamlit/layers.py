@@ -1,18 +1,145 @@
 """UI/pydeck helpers for the map and focus cards."""
 
+import functools
+import hashlib
+import io
+import math
+import time
+import urllib.request
+from collections.abc import Iterable
 from datetime import datetime, timezone
+from pathlib import Path
 
+import numpy as np
 import pandas as pd
 import pydeck as pdk
 
 from config import FLAG_DICT
 
 
-def compute_view_state(stations: pd.DataFrame) -> pdk.ViewState:
-    """Center map on barycenter of stations (fallback to France-ish)."""
+# Niveaux de zoom indexés par marts.dim_station_grid (cellules de 64 px)
+GRID_ZOOMS = range(4, 13)
+CELL_TILE_OFFSET = 2  # cellule = tuile Web Mercator au zoom z + 2
+# Carte de référence (pleine largeur), pour le zoom ajusté à l'emprise
+MAP_WIDTH_PX, MAP_HEIGHT_PX = 1200, 500
+CLUSTER_COLUMNS = ["n_stations", "station_id", "station_name", "status", "lon", "lat"]
+
+
+def _merc_y(lat: float) -> float:
+    """Web Mercator y in [0, 1) (0 = north)."""
+    lat_rad = math.radians(max(-85.0, min(85.0, lat)))
+    return (1 - math.log(math.tan(lat_rad) + 1 / math.cos(lat_rad)) / math.pi) / 2
+
+
+def compute_view_state(
+    stations: pd.DataFrame, zoom: int | None = None
+) -> pdk.ViewState:
+    """Center map on barycenter of stations (fallback to France-ish).
+
+    Without `zoom`, picks the largest grid zoom that fits the stations' extent.
+    """
     center_lat = stations["latitude"].mean() if not stations.empty else 46.5
     center_lon = stations["longitude"].mean() if not stations.empty else 2.5
-    return pdk.ViewState(latitude=center_lat, longitude=center_lon, zoom=8)
+    if zoom is None:
+        zoom = GRID_ZOOMS[-1]
+        if len(stations) > 1:
+            span_x = (stations["longitude"].max() - stations["longitude"].min()) / 360
+            span_y = _merc_y(stations["latitude"].min()) - _merc_y(
+                stations["latitude"].max()
+            )
+            for span, px in ((span_x, MAP_WIDTH_PX), (span_y, MAP_HEIGHT_PX)):
+                if span > 0:
+                    zoom = min(zoom, math.floor(math.log2(px / (256 * span))))
+        zoom = max(GRID_ZOOMS[0], min(GRID_ZOOMS[-1], zoom))
+    return pdk.ViewState(latitude=center_lat, longitude=center_lon, zoom=zoom)
+
+
+def _grid_at_zoom(grid: pd.DataFrame, zoom: int) -> pd.DataFrame:
+    """Grid rows (one per station) of `zoom`."""
+    return grid[grid["zoom_level"] == zoom]
+
+
+def cluster_stations(
+    grid: pd.DataFrame,
+    station_ids: Iterable[str],
+    zoom: int,
+) -> pd.DataFrame:
+    """One point per grid cell: single station, or cluster of n stations."""
+    if grid.empty:
+        return pd.DataFrame(columns=CLUSTER_COLUMNS)
+    cells = _grid_at_zoom(grid, zoom)
+    cells = cells[cells["station_id"].isin(station_ids)]
+    points = (
+        cells.groupby(["cell_x", "cell_y"], sort=False)
+        .agg(
+            n_stations=("station_id", "size"),
+            station_id=("station_id", "first"),
+            station_name=("station_name", "first"),
+            lat=("latitude", "mean"),
+            lon=("longitude", "mean"),
+        )
+        .reset_index(drop=True)
+    )
+    clustered = points["n_stations"] > 1
+    points.loc[clustered, "station_name"] = (
+        points.loc[clustered, "n_stations"].astype(str) + " stations"
+    )
+    points["status"] = np.where(clustered, "Groupe de stations", "Station")
+    return points.round({"lat": 4, "lon": 4})[CLUSTER_COLUMNS]
+
+
+def cluster_focus(
+    focus: pd.DataFrame,
+    grid: pd.DataFrame,
+    zoom: int,
+) -> pd.DataFrame:
+    """Focus points merged per (flag, grid cell): one icon per flag and cell."""
+    if grid.empty or focus.empty:
+        return focus.iloc[0:0]
+    cells = _grid_at_zoom(grid, zoom)[["station_id", "cell_x", "cell_y"]]
+    merged = focus.merge(cells, on="station_id")
+    points = (
+        merged.groupby(["flag", "cell_x", "cell_y"], observed=True, sort=True)
+        .agg(
+            n_stations=("station_id", "size"),
+            station_id=("station_id", "first"),
+            status=("status", "first"),
+            station_name=("station_name", "first"),
+            lat=("lat", "mean"),
+            lon=("lon", "mean"),
+        )
+        .reset_index()
+    )
+    clustered = points["n_stations"] > 1
+    points.loc[clustered, "station_name"] = (
+        points.loc[clustered, "n_stations"].astype(str) + " stations"
+    )
+    points["flag"] = points["flag"].astype(focus["flag"].dtype)
+    return points.round({"lat": 4, "lon": 4})[FOCUS_COLUMNS]
+
+
+def picked_station(selection: dict) -> str | None:
+    """station_id of the clicked map object (pydeck selection event), if any.
+
+    A cluster point resolves to its first station; the drilldown selector lets
+    the user pick another one.
+    """
+    for objects in (selection or {}).get("objects", {}).values():
+        for obj in objects:
+            if obj.get("station_id"):
+                return obj["station_id"]
+    return None
+
+
+def build_zone_options(departments: pd.DataFrame) -> dict[str, tuple[str, ...]]:
+    """Zone selector options: label -> dept codes (regions first, then depts)."""
+    options: dict[str, tuple[str, ...]] = {}
+    for region, group in departments.groupby("region_name", sort=True):
+        if len(group) > 1:
+            options[f"Région {region}"] = tuple(group["dept_code"])
+    for row in departments.sort_values("dept_code").itertuples():
+        options[f"{row.dept_name} ({row.dept_code})"] = (row.dept_code,)
+    return options
 
 
 def freshness_badge(max_ts: datetime | None) -> tuple[str, str]:
@@ -31,35 +158,170 @@ def freshness_badge(max_ts: datetime | None) -> tuple[str, str]:
     return ("Périmé", "#ef4444")
 
 
-def build_station_scatter_layer(stations: pd.DataFrame) -> pdk.Layer:
-    """Grey scatter layer for all stations (map background)."""
-    stations_map = stations.rename(
-        columns={"longitude": "lon", "latitude": "lat"}
-    ).assign(status="Station")
+def build_station_scatter_layer(points: pd.DataFrame) -> pdk.Layer:
+    """Grey scatter layer for stations and clusters in view (map background).
+
+    Radius in pixels, growing with the number of stations of the cluster.
+    """
     return pdk.Layer(
         "ScatterplotLayer",
-        data=stations_map,
+        id="stations",
+        data=points.assign(
+            radius=4 + 2 * np.sqrt(points["n_stations"].astype(float) - 1)
+        ),
         get_position="[lon, lat]",
-        get_radius=1000,
+        get_radius="radius",
+        radius_units="pixels",
         get_color=[128, 128, 128],
         pickable=True,
     )
 
 
-def build_icon_layer(data: pd.DataFrame, icon_url: str, size) -> pdk.Layer | None:
-    """Icon layer for a given category; returns None when no points to display."""
-    if data is None or data.empty:
+# Atlas d'icônes partagé : une case de ICON_PX px par URL distincte, et un
+# mapping par drapeau ; chaque ligne ne porte que sa catégorie `flag`
+ICON_PX = 72  # icônes twemoji 72x72
+ICON_FETCH_TIMEOUT = 5
+ICON_RETRY_AFTER = 300  # secondes avant de retenter un atlas en échec
+# Servi par Streamlit (server.enableStaticServing) : <app>/static -> app/static/
+STATIC_DIR = Path(__file__).parent / "static"
+ICON_ATLAS_FILE = "icon_atlas.png"
+_atlas_failed_at: float | None = None
+
+# Colonnes envoyées à pydeck pour les points de focus (position + tooltip)
+FOCUS_COLUMNS = ["flag", "status", "station_id", "station_name", "lon", "lat"]
+
+
+def melt_focus_flags(latest: pd.DataFrame) -> pd.DataFrame:
+    """Long frame (one row per station x true flag), in FLAG_DICT order.
+
+    Single vectorized pass over the is_* columns; `flag` and `status` are
+    categoricals ordered like FLAG_DICT. Raises if a flag column is missing.
+    """
+    flags = list(FLAG_DICT)
+    categories = pd.CategoricalDtype(flags, ordered=True)
+    if latest.empty:
+        return pd.DataFrame(
+            {col: pd.Series(dtype=object) for col in FOCUS_COLUMNS}
+        ).astype({"flag": categories})
+    missing = [flag for flag in flags if flag not in latest.columns]
+    if missing:
+        raise KeyError(f"Flag column missing: {', '.join(missing)}")
+
+    mask = latest[flags].fillna(False).to_numpy(dtype=bool)
+    flag_idx, row_idx = np.nonzero(mask.T)  # tri par drapeau, puis par ligne
+    points = latest.iloc[row_idx]
+    focus = pd.DataFrame(
+        {
+            "flag": pd.Categorical.from_codes(flag_idx, dtype=categories),
+            "station_id": points["station_id"].to_numpy(),
+            "station_name": points["station_name"].to_numpy(),
+            "lon": points["longitude"].to_numpy(),
+            "lat": points["latitude"].to_numpy(),
+        }
+    )
+    titles = [FLAG_DICT[flag]["title"] for flag in flags]
+    focus["status"] = focus["flag"].cat.rename_categories(titles)
+    return focus.sort_values(["flag", "station_name"], kind="stable")[
+        FOCUS_COLUMNS
+    ].reset_index(drop=True)
+
+
+@functools.lru_cache(maxsize=1)
+def icon_atlas() -> tuple[str, dict[str, dict]]:
+    """Icon atlas of the focus layer: static file URL and icon mapping per flag.
+
+    Each distinct icon URL is downloaded once per process and pasted into a
+    single horizontal sprite, written under `static/` and served by Streamlit;
+    flags sharing an icon share its cell. The URL carries a content hash so
+    browsers fetch the image once per version of the atlas.
+
+    Raises:
+        OSError: If an icon cannot be downloaded (not cached: retried later).
+    """
+    from PIL import Image
+
+    urls = list(dict.fromkeys(meta["icon_url"] for meta in FLAG_DICT.values()))
+    atlas = Image.new("RGBA", (ICON_PX * len(urls), ICON_PX))
+    for i, url in enumerate(urls):
+        with urllib.request.urlopen(url, timeout=ICON_FETCH_TIMEOUT) as resp:
+            icon = Image.open(io.BytesIO(resp.read())).convert("RGBA")
+        atlas.paste(icon.resize((ICON_PX, ICON_PX)), (i * ICON_PX, 0))
+
+    png = io.BytesIO()
+    atlas.save(png, format="PNG")
+    STATIC_DIR.mkdir(exist_ok=True)
+    tmp = STATIC_DIR / f".{ICON_ATLAS_FILE}.tmp"
+    tmp.write_bytes(png.getvalue())
+    tmp.replace(STATIC_DIR / ICON_ATLAS_FILE)
+    digest = hashlib.sha256(png.getvalue()).hexdigest()[:12]
+    mapping = {
+        flag: {
+            "x": urls.index(meta["icon_url"]) * ICON_PX,
+            "y": 0,
+            "width": ICON_PX,
+            "height": ICON_PX,
+            "anchorY": ICON_PX,
+            "mask": False,
+        }
+        for flag, meta in FLAG_DICT.items()
+    }
+    return f"app/static/{ICON_ATLAS_FILE}?v={digest}", mapping
+
+
+def _icon_atlas_or_none() -> tuple[str, dict[str, dict]] | None:
+    """`icon_atlas()`, or None while icons are unreachable (retried periodically)."""
+    global _atlas_failed_at
+    if _atlas_failed_at and time.monotonic() - _atlas_failed_at < ICON_RETRY_AFTER:
+        return None
+    try:
+        return icon_atlas()
+    except OSError:
+        _atlas_failed_at = time.monotonic()
+        return None
+
+
+def _hex_rgba(color: str) -> list[int]:
+    digits = color.lstrip("#")
+    rgba = [int(digits[i : i + 2], 16) for i in range(0, len(digits), 2)]
+    return rgba if len(rgba) == 4 else [*rgba, 255]
+
+
+def build_icon_layer(
+    focus: pd.DataFrame, selected: list[str], size
+) -> pdk.Layer | None:
+    """Single icon layer for the selected categories; None when nothing to show.
+
+    Icons come from the shared atlas, picked by the `flag` column. Without an
+    atlas (icons unreachable), points are drawn in each category's accent.
+    """
+    data = focus[focus["status"].isin(selected)]
+    if data.empty:
         return None
+    data = data.assign(flag=data["flag"].astype(str), status=data["status"].astype(str))
 
-    df = data.copy()
-    df["icon_data"] = [
-        {"url": icon_url, "width": 242, "height": 242, "anchorY": 242}
-    ] * len(df)
+    atlas = _icon_atlas_or_none()
+    if atlas is None:
+        colors = {flag: _hex_rgba(meta["accent"]) for flag, meta in FLAG_DICT.items()}
+        return pdk.Layer(
+            "ScatterplotLayer",
+            id="focus",
+            data=data.assign(color=data["flag"].map(colors)),
+            get_position=["lon", "lat"],
+            get_fill_color="color",
+            get_radius=size / 4,
+            radius_units="pixels",
+            pickable=True,
+        )
 
+    atlas_url, mapping = atlas
     return pdk.Layer(
         "IconLayer",
-        data=df,
-        get_icon="icon_data",
+        id="focus",
+        data=data,
+        # Entre quotes : pydeck transmet l'URL telle quelle (pas d'accesseur)
+        icon_atlas=f"'{atlas_url}'",
+        icon_mapping=mapping,
+        get_icon="flag",
         get_size=size,
         size_scale=1,
         get_position=["lon", "lat"],
@@ -86,47 +348,30 @@ def render_focus_card_html(
     return html
 
 
-def build_focus_cards(
-    latest: pd.DataFrame,
-) -> tuple[str, list[tuple[str, pd.DataFrame, str]]]:
-    """Return (cards_html, map_options) for the focus section; requires is_* flags in data."""
-    cards_html = ""
-    map_options: list[tuple[str, pd.DataFrame, str]] = []
+def build_focus_cards(focus: pd.DataFrame) -> tuple[str, list[str]]:
+    """Return (cards_html, category titles) from the melted focus frame."""
+    if focus.empty:
+        return "", []
 
-    if latest.empty:
-        return cards_html, map_options
-
-    def pick_with_flag(df: pd.DataFrame, flag: str) -> pd.DataFrame:
-        """Select rows where a boolean flag is true; raises if flag is missing."""
-        if flag not in df.columns:
-            raise KeyError(f"Flag column missing: {flag}")
-        return df[df[flag].fillna(False)]
-
-    def add_focus(df: pd.DataFrame, title: str, icon_url: str, accent: str) -> None:
-        nonlocal cards_html, map_options
-        if df.empty:
-            return
-        df_points = df.rename(columns={"longitude": "lon", "latitude": "lat"}).assign(
-            status=title
-        )
-        count = len(df_points)
-        names = ", ".join(sorted(df_points["station_name"].tolist()))
+    summary = focus.groupby("flag", observed=True, sort=True)["station_name"].agg(
+        names=", ".join, count="size"
+    )
+    cards_html = ""
+    titles: list[str] = []
+    # Lignes déjà triées par (drapeau, nom) : jointure directe des noms
+    for flag, row in summary.iterrows():
+        meta = FLAG_DICT[flag]
         icon_html = (
-            f'<img src="{icon_url}" alt="{title}" width="18" height="18" '
-            'style="vertical-align:middle; margin-right:6px;" />'
+            f'<img src="{meta["icon_url"]}" alt="{meta["title"]}" '
+            'width="18" height="18" style="vertical-align:middle; margin-right:6px;" />'
         )
         cards_html += render_focus_card_html(
-            title, names, f"{count} station(s)", accent, icon_html=icon_html
-        )
-        map_options.append((title, df_points, icon_url))
-
-    for flag, meta in FLAG_DICT.items():
-        df_flag = pick_with_flag(latest, flag)
-        add_focus(
-            df_flag,
             meta["title"],
-            meta["icon_url"],
+            row["names"],
+            f"{row['count']} station(s)",
             meta["accent"],
+            icon_html=icon_html,
         )
+        titles.append(meta["title"])
 
-    return cards_html, map_options
+    return cards_html, titles
@@ -0,0 +1,355 @@
+"""Benchmark: ingestion hot path, stage by stage, across scale factors.
+
+For each scenario (number of départements x days of retained history) the
+real ingestion code is timed stage by stage against synthetic payloads that
+match the `paquet/horaire` columns (`scripts.mock.synthetic`):
+
+- fetch:   HTTP + streaming CSV parse from the local DPPaquetObs server
+- parse:   CSV -> Arrow alone, from in-memory payloads
+- concat:  per-département tables -> one batch
+- write:   `RawWriter` into a raw.obs_hourly already holding the history
+           (23 h of the 24 h window already loaded, as in steady state)
+- landing: typed Hive-partitioned Parquet drop
+
+Each stage reports seconds, rows/s and peak RSS. Results are saved as JSON
+(benchmarks/results/ by default) and can be compared with a previous run.
+
+Usage:
+    python -m benchmarks.ingestion.bench_pipeline --depts 1,10,100 \\
+        --history-days 1,30,365 --compare benchmarks/results/<previous>.json
+"""
+
+from __future__ import annotations
+
+import argparse
+import io
+import json
+import os
+import platform
+import resource
+import socket
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import urllib.request
+from collections.abc import Iterator
+from contextlib import contextmanager
+from datetime import UTC, datetime
+from pathlib import Path
+
+import duckdb
+import pyarrow as pa
+
+from scripts.ingestion import fetch_meteofrance_paquetobs as fetch
+from scripts.ingestion.landing import land_obs_hourly
+from scripts.ingestion.write_duckdb_raw import RawWriter
+from scripts.mock.synthetic import hourly_csv, station_id
+
+TABLE = "raw.obs_hourly"
+PK = ["validity_time", "geo_id_insee", "reference_time"]
+END = datetime(2026, 1, 15, 12, tzinfo=UTC)
+ISO = "%Y-%m-%dT%H:%M:%SZ"
+HISTORY_CHUNK_HOURS = 24 * 7
+RESULTS_DIR = Path(__file__).resolve().parents[1] / "results"
+
+
+# --------------------------------------------------------------------------- #
+# Mesures
+# --------------------------------------------------------------------------- #
+
+
+def _rss_bytes() -> int:
+    """Current resident set size (Linux /proc; falls back to the lifetime peak)."""
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except OSError:
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024
+
+
+class Stage:
+    """Timing + peak RSS of one stage (RSS sampled every 5 ms in a thread)."""
+
+    def __init__(self, name: str):
+        self.name = name
+        self.seconds = 0.0
+        self.rows = 0
+        self.peak_rss = 0
+        self._stop = threading.Event()
+
+    def _sample(self) -> None:
+        while not self._stop.wait(0.005):
+            self.peak_rss = max(self.peak_rss, _rss_bytes())
+
+    def as_dict(self) -> dict:
+        return {
+            "seconds": round(self.seconds, 4),
+            "rows": self.rows,
+            "rows_per_s": round(self.rows / self.seconds) if self.seconds else None,
+            "peak_rss_mb": round(self.peak_rss / 2**20, 1),
+        }
+
+
+@contextmanager
+def measure(stages: dict[str, Stage], name: str) -> Iterator[Stage]:
+    """Time the enclosed block; the caller sets `stage.rows`."""
+    stage = Stage(name)
+    stage.peak_rss = _rss_bytes()
+    sampler = threading.Thread(target=stage._sample, daemon=True)
+    sampler.start()
+    start = time.perf_counter()
+    try:
+        yield stage
+    finally:
+        stage.seconds = time.perf_counter() - start
+        stage._stop.set()
+        sampler.join()
+        stage.peak_rss = max(stage.peak_rss, _rss_bytes())
+        stages[name] = stage
+
+
+# --------------------------------------------------------------------------- #
+# Serveur local
+# --------------------------------------------------------------------------- #
+
+
+def _free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+@contextmanager
+def local_api(n_stations: int) -> Iterator[str]:
+    """Run the DPPaquetObs stand-in in a subprocess (its RSS is not counted)."""
+    port = _free_port()
+    proc = subprocess.Popen(
+        [
+            sys.executable,
+            "-m",
+            "scripts.mock.paquetobs_server",
+            "--port",
+            str(port),
+            "--stations",
+            str(n_stations),
+            "--end",
+            END.isoformat(),
+        ],
+        stdout=subprocess.DEVNULL,
+    )
+    root = f"http://127.0.0.1:{port}"
+    try:
+        for _ in range(100):
+            try:
+                urllib.request.urlopen(f"{root}/_stats", timeout=1).close()
+                break
+            except OSError:
+                time.sleep(0.1)
+        yield f"{root}/public/DPPaquetObs/v1"
+    finally:
+        proc.terminate()
+        proc.wait()
+
+
+# --------------------------------------------------------------------------- #
+# Historique
+# --------------------------------------------------------------------------- #
+
+
+def grow_history(db_path: str, depts: list[str], n_stations: int, days: int) -> int:
+    """Fill raw.obs_hourly with `days` of past hours up to the latest fetched one.
+
+    The newest hour of the fetch window is left out, so that the timed write
+    inserts one new hour and ignores 23 already loaded ones.
+    """
+    ids = pa.table(
+        {"geo_id_insee": [station_id(d, i) for d in depts for i in range(n_stations)]}
+    )
+    with duckdb.connect(db_path) as con:
+        con.register("ids", ids)
+        # Une semaine par transaction : la mémoire reste bornée sur un an d'historique
+        for first in range(1, days * 24 + 1, HISTORY_CHUNK_HOURS):
+            last = min(first + HISTORY_CHUNK_HOURS, days * 24 + 1)
+            con.execute(
+                f"""
+                INSERT OR IGNORE INTO {TABLE} BY NAME
+                SELECT
+                    ids.geo_id_insee,
+                    strftime($end - to_hours(h), '{ISO}') AS validity_time,
+                    validity_time AS reference_time,
+                    '281.15' AS t,
+                    '0.2' AS rr1,
+                    '0' AS dept_code,
+                    now() AS load_time
+                FROM ids, range($first, $last) r(h)
+                """,
+                {"end": END, "first": first, "last": last},
+            )
+        return con.execute(f"SELECT count(*) FROM {TABLE}").fetchone()[0]
+
+
+# --------------------------------------------------------------------------- #
+# Scénario
+# --------------------------------------------------------------------------- #
+
+
+def run_scenario(
+    base_url: str, n_depts: int, days: int, n_stations: int, workers: int, workdir: Path
+) -> dict:
+    """Run every stage once for `n_depts` départements and `days` of history."""
+    depts = list(fetch.ALL_DEPTS[:n_depts])
+    db_path = str(workdir / f"bench_{n_depts}_{days}.duckdb")
+    stages: dict[str, Stage] = {}
+
+    fetch.ENDPOINTS.update(
+        stations=f"{base_url}/liste-stations", hourly=f"{base_url}/paquet/horaire"
+    )
+    session = fetch.open_session_paquetobs(
+        apikey="bench", limiter=fetch.RateLimiter(10**6), pool_maxsize=workers
+    )
+    # Passage à blanc : génération des paquets côté serveur, connexions ouvertes
+    fetch.fetch_hourly_for_depts(session, depts, max_workers=workers)
+
+    with measure(stages, "fetch") as st:
+        frames, errors = fetch.fetch_hourly_for_depts(
+            session, depts, max_workers=workers
+        )
+        st.rows = sum(t.num_rows for t in frames.values())
+    if errors:
+        raise RuntimeError(f"Fetch en échec : {sorted(errors)}")
+
+    payloads = [hourly_csv(d, n_stations, end=END).encode("utf-8") for d in depts]
+    with measure(stages, "parse") as st:
+        parsed = [fetch.read_csv_stream(io.BytesIO(p)) for p in payloads]
+        st.rows = sum(t.num_rows for t in parsed)
+    del payloads, parsed
+
+    with measure(stages, "concat") as st:
+        batch = pa.concat_tables(frames.values(), promote_options="default")
+        st.rows = batch.num_rows
+
+    # Table + index créés par le chemin réel d'écriture, puis historique
+    with RawWriter(db_path) as writer:
+        writer.write(batch.slice(0, 0), TABLE, PK)
+    history = grow_history(db_path, depts, n_stations, days)
+
+    with measure(stages, "write") as st:
+        with RawWriter(db_path) as writer:
+            writer.write(batch, TABLE, PK)
+            load_time = writer.load_time
+        st.rows = batch.num_rows
+
+    with measure(stages, "landing") as st:
+        land_obs_hourly(batch, str(workdir / f"landing_{n_depts}_{days}"), load_time)
+        st.rows = batch.num_rows
+
+    Path(db_path).unlink()
+    return {
+        "depts": n_depts,
+        "history_days": days,
+        "history_rows": history,
+        "batch_rows": batch.num_rows,
+        "stages": {name: stage.as_dict() for name, stage in stages.items()},
+    }
+
+
+# --------------------------------------------------------------------------- #
+# Résultats
+# --------------------------------------------------------------------------- #
+
+
+def _git_commit() -> str | None:
+    """Short HEAD hash, or None outside a git checkout (or without git)."""
+    try:
+        out = subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"],
+            capture_output=True,
+            text=True,
+            check=True,
+        )
+        return out.stdout.strip() or None
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def _print_scenario(result: dict, previous: dict | None) -> None:
+    print(
+        f"\ndepts={result['depts']} history_days={result['history_days']} "
+        f"history_rows={result['history_rows']:,} batch_rows={result['batch_rows']:,}"
+    )
+    header = ("stage", "seconds", "rows/s", "peak_rss_mb", "vs_prev")
+    print("  {:<8} {:>9} {:>12} {:>12} {:>8}".format(*header))
+    for name, s in result["stages"].items():
+        delta = ""
+        prev = (previous or {}).get("stages", {}).get(name)
+        if prev and prev.get("rows_per_s") and s["rows_per_s"]:
+            delta = f"{s['rows_per_s'] / prev['rows_per_s']:.2f}x"
+        print(
+            f"  {name:<8} {s['seconds']:>9.3f} {s['rows_per_s'] or 0:>12,} "
+            f"{s['peak_rss_mb']:>12.1f} {delta:>8}"
+        )
+
+
+def main() -> None:
+    """CLI: run the scenario grid, print a table per scenario, save JSON."""
+    ap = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    ap.add_argument("--depts", default="1,10,100", help="Nombres de départements.")
+    ap.add_argument(
+        "--history-days", default="1,30,365", help="Jours d'historique déjà chargés."
+    )
+    ap.add_argument(
+        "--stations", type=int, default=40, help="Stations par département."
+    )
+    ap.add_argument("--workers", type=int, default=fetch.DEFAULT_WORKERS)
+    ap.add_argument(
+        "--out", default=None, help="Fichier JSON (défaut : benchmarks/results/)."
+    )
+    ap.add_argument("--compare", default=None, help="Résultats JSON précédents.")
+    args = ap.parse_args()
+
+    n_depts = sorted(min(int(n), len(fetch.ALL_DEPTS)) for n in args.depts.split(","))
+    days = sorted(int(d) for d in args.history_days.split(","))
+    previous: dict[tuple[int, int], dict] = {}
+    if args.compare:
+        for r in json.loads(Path(args.compare).read_text())["scenarios"]:
+            previous[(r["depts"], r["history_days"])] = r
+
+    scenarios = []
+    with tempfile.TemporaryDirectory() as tmp, local_api(args.stations) as base_url:
+        for n in n_depts:
+            for d in days:
+                result = run_scenario(
+                    base_url, n, d, args.stations, args.workers, Path(tmp)
+                )
+                _print_scenario(result, previous.get((n, d)))
+                scenarios.append(result)
+
+    now = datetime.now(UTC)
+    report = {
+        "benchmark": "ingestion_pipeline",
+        "created_at": now.strftime(ISO),
+        "git_commit": _git_commit(),
+        "environment": {
+            "python": platform.python_version(),
+            "duckdb": duckdb.__version__,
+            "pyarrow": pa.__version__,
+            "machine": platform.machine(),
+            "cpu_count": os.cpu_count(),
+        },
+        "config": {"stations_per_dept": args.stations, "workers": args.workers},
+        "scenarios": scenarios,
+    }
+    out = (
+        Path(args.out)
+        if args.out
+        else RESULTS_DIR / f"ingestion_{now:%Y%m%dT%H%M%SZ}.json"
+    )
+    out.parent.mkdir(parents=True, exist_ok=True)
+    out.write_text(json.dumps(report, indent=2) + "\n")
+    print(f"\nRésultats : {out}")
+
+
+if __name__ == "__main__":
+    main()
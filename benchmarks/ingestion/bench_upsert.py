@@ -0,0 +1,126 @@
+"""Benchmark: raw.obs_hourly load time as the table history grows.
+
+Grows a synthetic `raw.obs_hourly` through the requested sizes and, at each
+size, times `write_raw_dedup` on a realistic hourly payload (24 h window for
+every station, 23 h already loaded, 1 new hour). With the unique PK index the
+load time should stay flat; an anti-join would grow linearly with history.
+
+Usage:
+    python -m benchmarks.ingestion.bench_upsert --sizes 10000,1000000,50000000
+"""
+
+from __future__ import annotations
+
+import argparse
+import tempfile
+import time
+from datetime import UTC, datetime, timedelta
+from pathlib import Path
+
+import duckdb
+import pyarrow as pa
+
+from scripts.ingestion.write_duckdb_raw import write_raw_dedup
+
+TABLE = "raw.obs_hourly"
+PK = ["validity_time", "geo_id_insee", "reference_time"]
+T0 = datetime(2026, 1, 1, tzinfo=UTC)
+ISO = "%Y-%m-%dT%H:%M:%SZ"
+
+
+def _station_id(i: int) -> str:
+    return f"09{i:06d}"
+
+
+def build_batch(n_stations: int, new_hours: int = 1) -> pa.Table:
+    """Hourly payload: 24 h per station, the `new_hours` latest not yet loaded."""
+    rows = {c: [] for c in ("geo_id_insee", "validity_time", "reference_time")}
+    for h in range(-new_hours, 24 - new_hours):
+        ts = (T0 - timedelta(hours=h)).strftime(ISO)
+        for i in range(n_stations):
+            rows["geo_id_insee"].append(_station_id(i))
+            rows["validity_time"].append(ts)
+            rows["reference_time"].append(ts)
+    n = len(rows["geo_id_insee"])
+    return pa.table(
+        {
+            **rows,
+            "t": pa.repeat("281.15", n).cast(pa.string()),
+            "rr1": pa.repeat("0.2", n).cast(pa.string()),
+            "dept_code": pa.repeat("9", n).cast(pa.string()),
+        }
+    )
+
+
+def grow_history(db_path: str, target_rows: int, n_stations: int) -> int:
+    """Append synthetic past hours until `raw.obs_hourly` holds `target_rows` rows."""
+    with duckdb.connect(db_path) as con:
+        current = con.execute(f"SELECT count(*) FROM {TABLE}").fetchone()[0]
+        if current >= target_rows:
+            return current
+        # Les heures passées sont générées à rebours, après celles déjà présentes
+        con.execute(
+            f"""
+            INSERT OR IGNORE INTO {TABLE} BY NAME
+            SELECT
+                '09' || lpad(cast(r % $stations AS VARCHAR), 6, '0') AS geo_id_insee,
+                strftime($t0 - to_hours(cast(r // $stations AS BIGINT)), '{ISO}')
+                    AS validity_time,
+                validity_time AS reference_time,
+                '281.15' AS t,
+                '0.2' AS rr1,
+                '9' AS dept_code,
+                now() AS load_time
+            FROM range($start, $stop) t(r)
+            """,
+            {
+                "stations": n_stations,
+                "t0": T0,
+                "start": current + 24 * n_stations,
+                "stop": target_rows + 24 * n_stations,
+            },
+        )
+        return con.execute(f"SELECT count(*) FROM {TABLE}").fetchone()[0]
+
+
+def main() -> None:
+    """CLI: print load time of one hourly payload per history size."""
+    ap = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    ap.add_argument(
+        "--sizes",
+        default="10000,100000,1000000,10000000,50000000",
+        help="Tailles d'historique (lignes) séparées par des virgules.",
+    )
+    ap.add_argument("--stations", type=int, default=300)
+    ap.add_argument("--repeat", type=int, default=3)
+    ap.add_argument("--db", default=None, help="Fichier DuckDB (défaut : temporaire).")
+    args = ap.parse_args()
+
+    sizes = sorted(int(s) for s in args.sizes.split(","))
+    tmp = tempfile.TemporaryDirectory()
+    db_path = args.db or str(Path(tmp.name) / "bench.duckdb")
+
+    # Création de la table + index via le chemin réel d'écriture
+    write_raw_dedup(build_batch(args.stations), TABLE, PK, db_path)
+
+    print(f"{'history_rows':>14} {'batch_rows':>11} {'best_ms':>9} {'mean_ms':>9}")
+    new_hours = 0
+    for size in sizes:
+        history = grow_history(db_path, size, args.stations)
+        timings = []
+        for _ in range(args.repeat):
+            new_hours += 1  # chaque lot apporte une heure encore jamais chargée
+            batch = build_batch(args.stations, new_hours=new_hours)
+            start = time.perf_counter()
+            write_raw_dedup(batch, TABLE, PK, db_path)
+            timings.append((time.perf_counter() - start) * 1000)
+        print(
+            f"{history:>14,} {batch.num_rows:>11,} "
+            f"{min(timings):>9.1f} {sum(timings) / len(timings):>9.1f}"
+        )
+
+    tmp.cleanup()
+
+
+if __name__ == "__main__":
+    main()
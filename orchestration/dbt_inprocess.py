@@ -0,0 +1,129 @@
+"""Exécution de dbt dans le process du flow Prefect (`dbtRunner`).
+
+Un `make dbt-build` par run coûte un shell, make, un interpréteur Python, un
+`dbt deps` et un parsing complet du projet. Ici :
+
+- dbt est appelé en Python (`dbtRunner`), dans le process du flow ;
+- l'état de parsing (`partial_parse.msgpack`, `manifest.json`) est conservé
+  dans `DBT_TARGET_PATH` (par défaut sous `data/`, volume persistant en
+  Docker) : d'un run à l'autre, seuls les fichiers modifiés sont reparsés ;
+- dans un même process, le manifest parsé est réutilisé tant que les fichiers
+  du projet n'ont pas changé (empreinte chemins + mtime + taille) ;
+- `dbt deps` n'est lancé que si `packages.yml` / `package-lock.yml` ont changé
+  depuis la dernière installation (empreinte enregistrée dans le target).
+"""
+
+from __future__ import annotations
+
+import hashlib
+import os
+from pathlib import Path
+
+from dbt.adapters.duckdb.connections import DuckDBConnectionManager
+from dbt.cli.main import dbtRunner, dbtRunnerResult
+
+PROJECT_ROOT = Path(__file__).resolve().parents[1]
+DBT_TARGET_PATH = Path(
+    os.getenv("DBT_TARGET_PATH", PROJECT_ROOT / "data" / "dbt_target")
+)
+DBT_PROFILES_DIR = Path(os.getenv("DBT_PROFILES_DIR", PROJECT_ROOT / "profiles"))
+PACKAGES_INSTALL_PATH = PROJECT_ROOT / "dbt_packages"
+
+# Fichiers dont dépend le parsing (hors packages, couverts par le lock)
+PROJECT_FILES: tuple[str, ...] = ("dbt_project.yml", "packages.yml", "package-lock.yml")
+PROJECT_DIRS: tuple[str, ...] = ("weather_dbt",)
+DEPS_STAMP = ".deps.sha256"
+
+# Manifest parsé, réutilisé par les invocations suivantes du même process
+_warm: dict = {}
+
+
+def _common_args(command: str) -> list[str]:
+    args = ["--project-dir", str(PROJECT_ROOT)]
+    if command != "deps":
+        args += ["--profiles-dir", str(DBT_PROFILES_DIR)]
+        args += ["--target-path", str(DBT_TARGET_PATH)]
+    return args
+
+
+def _invoke(runner: dbtRunner, args: list[str]) -> dbtRunnerResult:
+    """Lance `dbt <args>` et lève une erreur explicite en cas d'échec.
+
+    La connexion DuckDB gardée par dbt-duckdb est fermée après chaque commande :
+    l'ingestion et la publication du snapshot (lecture seule) rouvrent le
+    fichier dans le même process.
+    """
+    try:
+        result = runner.invoke([*args, *_common_args(args[0])])
+    finally:
+        DuckDBConnectionManager.close_all_connections()
+    if not result.success:
+        detail = f" : {result.exception}" if result.exception else ""
+        raise RuntimeError(f"dbt {' '.join(args)} en échec{detail}")
+    return result
+
+
+def _lock_digest() -> str:
+    digest = hashlib.sha256()
+    for name in ("packages.yml", "package-lock.yml"):
+        path = PROJECT_ROOT / name
+        digest.update(path.read_bytes() if path.exists() else b"")
+    return digest.hexdigest()
+
+
+def _project_fingerprint() -> str:
+    """Empreinte des fichiers du projet (chemin, mtime, taille), sans les lire."""
+    digest = hashlib.sha256()
+    paths = [PROJECT_ROOT / name for name in PROJECT_FILES]
+    paths.append(DBT_PROFILES_DIR / "profiles.yml")
+    for folder in PROJECT_DIRS:
+        paths.extend(sorted((PROJECT_ROOT / folder).rglob("*")))
+    for path in paths:
+        try:
+            stat = path.stat()
+        except FileNotFoundError:
+            continue
+        digest.update(f"{path}:{stat.st_mtime_ns}:{stat.st_size}\n".encode())
+    return digest.hexdigest()
+
+
+def ensure_deps() -> bool:
+    """Installe les packages dbt si le lock a changé (ou s'ils sont absents).
+
+    Returns:
+        bool: True si `dbt deps` a été exécuté.
+    """
+    stamp = DBT_TARGET_PATH / DEPS_STAMP
+    digest = _lock_digest()
+    if (
+        PACKAGES_INSTALL_PATH.is_dir()
+        and stamp.exists()
+        and stamp.read_text().strip() == digest
+    ):
+        return False
+    _invoke(dbtRunner(), ["deps"])
+    DBT_TARGET_PATH.mkdir(parents=True, exist_ok=True)
+    # Empreinte relue après deps : le lock peut avoir été (ré)écrit
+    stamp.write_text(_lock_digest() + "\n")
+    _warm.clear()
+    return True
+
+
+def load_manifest():
+    """Manifest du projet : en mémoire si le projet n'a pas changé, sinon
+    `dbt parse` (partiel, à partir de l'état conservé dans le target)."""
+    fingerprint = _project_fingerprint()
+    if _warm.get("fingerprint") != fingerprint:
+        result = _invoke(dbtRunner(), ["parse"])
+        _warm.update(fingerprint=fingerprint, manifest=result.result)
+    return _warm["manifest"]
+
+
+def run_dbt(*args: str) -> dbtRunnerResult:
+    """Exécute une commande dbt en process (ex. `run_dbt("build")`).
+
+    Les packages sont installés si besoin, puis la commande réutilise le
+    manifest chaud : aucun parsing quand le projet n'a pas changé.
+    """
+    ensure_deps()
+    return _invoke(dbtRunner(manifest=load_manifest()), list(args))
@@ -1,60 +1,218 @@
-"""Local Prefect flow: Météo-France ingestion → dbt build (DuckDB)."""
+"""Local Prefect flow: Météo-France ingestion → dbt build (DuckDB) → snapshot servi.
 
-from pathlib import Path
-import subprocess
+Les tâches appellent l'ingestion, dbt (`dbtRunner`, cf. dbt_inprocess.py) et la
+publication directement en Python, dans le process du flow : pas de shell, de
+make ni d'interpréteur relancé à chaque run.
+
+L'ingestion est éclatée par département (une tâche Prefect par code, avec
+retries, `INGEST_CONCURRENCY` en parallèle), puis un seul chargement raw et un
+`dbt build` limité aux modèles en aval des sources qui ont reçu des lignes.
+
+Chaque run est inscrit dans un journal (`raw._pipeline_runs`, cf. run_ledger.py) :
+sans nouvelle ligne raw depuis le dernier build réussi, dbt et la publication
+sont court-circuités.
+"""
 
-from prefect import flow, task
+import functools
+import os
+import sys
+from datetime import UTC, datetime
+from pathlib import Path
 
+import pyarrow as pa
+from dotenv import load_dotenv
+from prefect import flow, get_run_logger, task
+from prefect.task_runners import ThreadPoolTaskRunner
 
 PROJECT_ROOT = Path(__file__).resolve().parents[1]
+if str(PROJECT_ROOT) not in sys.path:
+    sys.path.insert(0, str(PROJECT_ROOT))
+load_dotenv(PROJECT_ROOT / ".env")
+
+# Imports du projet après le bootstrap : racine sur sys.path, et .env lu avant
+# les constantes lues à l'import (DBT_TARGET_PATH, METEOFRANCE_BASE_URL…)
+from orchestration.dbt_inprocess import run_dbt
+from orchestration.run_ledger import (
+    BUILT,
+    FAILED,
+    SKIPPED,
+    finish_run,
+    pending_rows,
+    record_load,
+)
+from scripts.ingestion.fetch_meteofrance_paquetobs import (
+    RateLimiter,
+    fetch_hourly_for_dept,
+    open_session_paquetobs,
+    parse_depts,
+)
+from scripts.ingestion.write_duckdb_raw import load_fetched
+from scripts.serving.publish_snapshot import (
+    current_version,
+    prune_versions,
+    publish_snapshot,
+)
+
+DB_PATH = os.getenv("DUCKDB_PATH", "data/warehouse.duckdb")
+SERVING_PATH = os.getenv("SERVING_PATH", "data/serving")
+SERVING_KEEP = 3
+
+# Tâches d'ingestion en parallèle (le quota API reste borné par le RateLimiter
+# partagé) ; le tag permet en plus une limite côté serveur Prefect
+INGEST_CONCURRENCY = int(os.getenv("INGEST_CONCURRENCY", "8"))
+INGEST_TAG = "meteofrance-api"
+
+# Sélecteurs dbt par table raw : seuls les modèles en aval d'une source qui a
+# reçu des lignes sont reconstruits
+OBS_SELECTOR = "source:raw.obs_hourly+"
+STATIONS_SELECTOR = "source:raw.stations+"
+# Modèle témoin : absent = warehouse jamais construit, build complet
+BUILT_MARKER = ("marts", "fct_obs_hourly")
+
+
+@functools.lru_cache(maxsize=1)
+def _api_session():
+    """Session HTTP partagée par les tâches du run (pool + limiteur commun)."""
+    return open_session_paquetobs(
+        limiter=RateLimiter(), pool_maxsize=INGEST_CONCURRENCY
+    )
 
 
-def run_cmd(cmd: str) -> None:
+@task(retries=3, retry_delay_seconds=[10, 30, 60], tags=[INGEST_TAG])
+def fetch_dept(dept: str) -> pa.Table:
     """
-    Helper pour exécuter une commande shell depuis la racine du projet,
-    avec affichage des logs en direct et erreur explicite en cas d'échec.
+    Tâche Prefect : paquet horaire d'un département (retries par département).
     """
-    result = subprocess.run(
-        cmd,
-        shell=True,
-        cwd=PROJECT_ROOT,
-        text=True,
-    )
-    if result.returncode != 0:
-        raise RuntimeError(f"Command failed with code {result.returncode}: {cmd}")
+    return fetch_hourly_for_dept(_api_session(), dept)
+
+
+@task
+def load_raw(frames: dict[str, pa.Table]) -> dict[str, int]:
+    """
+    Tâche Prefect : chargement des paquets reçus (+ stations si la liste a
+    changé) dans raw.*, en une transaction. Renvoie les lignes insérées par table.
+    """
+    return load_fetched(_api_session(), frames, DB_PATH)
+
+
+def _warehouse_built() -> bool:
+    import duckdb
+
+    if not Path(DB_PATH).exists():
+        return False
+    with duckdb.connect(DB_PATH, read_only=True) as con:
+        return bool(
+            con.execute(
+                "SELECT 1 FROM information_schema.tables"
+                " WHERE table_schema = ? AND table_name = ?",
+                list(BUILT_MARKER),
+            ).fetchone()
+        )
+
+
+def dbt_selection(pending: dict[str, int]) -> list[list[str]]:
+    """Arguments des `dbt build` à lancer pour les lignes dues (vide : rien à faire).
+
+    Les modèles en aval de raw.stations (fct_obs_hourly, agg_*) sont
+    incrémentaux sur les observations : leurs filigranes ne relisent pas les
+    lignes déjà construites. Une liste de stations modifiée impose donc leur
+    reconstruction complète ; les modèles propres aux observations restent
+    incrémentaux et passent avant.
+    """
+    if not pending.get("raw.stations"):
+        return [["--select", OBS_SELECTOR]] if pending.get("raw.obs_hourly") else []
+    steps = []
+    if pending.get("raw.obs_hourly"):
+        steps.append(["--select", OBS_SELECTOR, "--exclude", STATIONS_SELECTOR])
+    steps.append(["--select", STATIONS_SELECTOR, "--full-refresh"])
+    return steps
 
 
 @task
-def ingest_meteofrance(dept: int = 9) -> None:
+def run_dbt_build(pending: dict[str, int]) -> tuple[str, list[str] | None]:
     """
-    Tâche Prefect : ingestion des données brutes depuis l’API Météo-France
-    vers DuckDB, via le Makefile.
+    Tâche Prefect : dbt build en process, limité à l'aval des sources ayant
+    des lignes pas encore reconstruites (build complet si le warehouse
+    n'est pas construit, ignoré s'il n'y a rien de nouveau ; reconstruction
+    complète de l'aval des stations si leur liste a changé).
+
+    Renvoie l'issue pour le journal et les arguments de chaque build lancé
+    (None = build complet).
     """
-    cmd = f"make dwh-ingest DEPT={dept}"
-    run_cmd(cmd)
+    logger = get_run_logger()
+    if not _warehouse_built():
+        logger.info("Warehouse non construit : dbt build complet")
+        run_dbt("build")
+        return BUILT, None
+    steps = dbt_selection(pending)
+    if not steps:
+        logger.info("Aucune nouvelle ligne raw : dbt build ignoré")
+        return SKIPPED, []
+    for args in steps:
+        logger.info("dbt build %s", " ".join(args))
+        run_dbt("build", *args)
+    return BUILT, [" ".join(args) for args in steps]
 
 
 @task
-def run_dbt_build() -> None:
+def publish_serving_snapshot() -> str:
     """
-    Tâche Prefect : exécution de dbt (deps + build) sur le projet.
+    Tâche Prefect : publication des marts du dashboard en snapshot Arrow
+    (le dashboard ne lit plus le fichier DuckDB). Renvoie la version publiée.
     """
-    cmd = "make dbt-build"
-    run_cmd(cmd)
+    version = publish_snapshot(DB_PATH, SERVING_PATH)
+    prune_versions(SERVING_PATH, SERVING_KEEP)
+    return version
 
 
-@flow(name="weather-hourly-pipeline")
-def weather_hourly_pipeline(dept: int = 9) -> None:
+@flow(
+    name="weather-hourly-pipeline",
+    task_runner=ThreadPoolTaskRunner(max_workers=INGEST_CONCURRENCY),
+)
+def weather_hourly_pipeline(depts: str = "9") -> None:
     """
-    Flow Prefect : enchaîne ingestion + dbt build.
+    Flow Prefect : ingestion par département (tâches parallèles) → chargement
+    raw → dbt build sélectif → publication du snapshot servi.
+
+    `depts` : 'all' ou codes séparés par des virgules (ex. '09,75,2A').
     """
-    ingest_meteofrance(dept)
-    run_dbt_build()
+    started_at = datetime.now(UTC)
+    codes = parse_depts(depts)
+    futures = fetch_dept.map(codes)
+
+    # Un département en échec (retries épuisés) n'empêche pas de charger les autres
+    frames: dict[str, pa.Table] = {}
+    failed: list[str] = []
+    for code, future in zip(codes, futures):
+        try:
+            frames[code] = future.result()
+        except Exception:  # noqa: BLE001 - l'échec est déjà journalisé par Prefect
+            failed.append(code)
+
+    inserted = load_raw(frames)
+    run_id = record_load(DB_PATH, depts, inserted, failed, started_at)
+
+    # Un échec (dbt ou publication) laisse les lignes dues : repris au run suivant
+    try:
+        status, selection = run_dbt_build(pending_rows(DB_PATH))
+        version = None
+        if status == BUILT or current_version(SERVING_PATH) is None:
+            version = publish_serving_snapshot()
+    except BaseException:
+        finish_run(DB_PATH, run_id, FAILED)
+        raise
+    finish_run(DB_PATH, run_id, status, selection, version)
+
+    if failed:
+        raise RuntimeError(f"Départements en échec : {', '.join(sorted(failed))}")
 
 
 if __name__ == "__main__":
     import argparse
 
+    # Chemins relatifs (profil dbt, warehouse, snapshots) résolus depuis la racine
+    os.chdir(PROJECT_ROOT)
+
     parser = argparse.ArgumentParser(
         description="Weather pipeline orchestrated with Prefect"
     )
@@ -65,23 +223,24 @@ if __name__ == "__main__":
         help="run = exécuter une fois ; serve = créer un deployment + schedule et écouter les runs",
     )
     parser.add_argument(
+        "--depts",
         "--dept",
-        type=int,
-        default=9,
-        help="Code département Météo-France (ex : 9 pour Ariège)",
+        default="9",
+        help="Codes département Météo-France : 'all' ou liste (ex : 9,75,2A)",
     )
 
     args = parser.parse_args()
 
     if args.mode == "run":
         # Exécution simple
-        weather_hourly_pipeline(dept=args.dept)
+        weather_hourly_pipeline(depts=args.depts)
 
     elif args.mode == "serve":
         # Crée un deployment + schedule cron (toutes les heures)
         # et démarre un process long qui écoute les runs planifiés.
         weather_hourly_pipeline.serve(
             name="weather-hourly-deployment",
+            parameters={"depts": args.depts},
             cron="0 * * * *",  # toutes les heures à minute 0
             tags=["weather", "hourly", "demo"],
             pause_on_shutdown=True,  # auto-pause le schedule si on stoppe le process
@@ -0,0 +1,139 @@
+"""Journal des runs du flow horaire (table `raw._pipeline_runs` du warehouse).
+
+Une ligne par run : départements demandés et en échec, lignes réellement
+insérées par table raw, issue du `dbt build` et version du snapshot publiée.
+
+Le journal sert de court-circuit : les lignes à reconstruire sont celles
+insérées depuis le dernier build réussi (run courant compris). Un run sans
+nouvelle ligne ne lance ni dbt ni publication ; des lignes chargées par un run
+dont le build a échoué restent dues et sont reprises au run suivant.
+
+Des stations nouvelles dans raw.stations entraînent la reconstruction complète
+des marts en aval (`--full-refresh`, cf. `dbt_selection` du flow). Un attribut
+modifié d'une station déjà connue (nom, position) n'atteint pas raw : la clé
+`Id_station` garde la première version chargée.
+
+La table vit dans le schéma `raw` : elle survit à `make dwh-reset`, et un
+warehouse remis à zéro repasse de toute façon par un build complet.
+"""
+
+from __future__ import annotations
+
+import uuid
+from datetime import UTC, datetime
+
+import duckdb
+
+LEDGER_TABLE = "raw._pipeline_runs"
+LEDGER_DDL = """
+    run_id VARCHAR PRIMARY KEY,
+    started_at TIMESTAMPTZ,
+    finished_at TIMESTAMPTZ,
+    depts VARCHAR,
+    failed_depts VARCHAR[],
+    stations_inserted BIGINT,
+    obs_inserted BIGINT,
+    dbt_status VARCHAR,
+    dbt_selection VARCHAR[],
+    published_version VARCHAR
+"""
+
+# Colonnes de comptage par table raw
+INSERTED_COLUMNS: dict[str, str] = {
+    "raw.stations": "stations_inserted",
+    "raw.obs_hourly": "obs_inserted",
+}
+
+# Issues du dbt build : 'built' (complet ou sélectif), 'skipped', 'failed'
+BUILT = "built"
+SKIPPED = "skipped"
+FAILED = "failed"
+
+
+def _connect(db_path: str) -> duckdb.DuckDBPyConnection:
+    con = duckdb.connect(db_path)
+    con.execute("CREATE SCHEMA IF NOT EXISTS raw;")
+    con.execute(f"CREATE TABLE IF NOT EXISTS {LEDGER_TABLE} ({LEDGER_DDL});")
+    return con
+
+
+def record_load(
+    db_path: str,
+    depts: str,
+    inserted: dict[str, int],
+    failed: list[str],
+    started_at: datetime,
+) -> str:
+    """Ouvre la ligne du run, une fois le chargement raw terminé.
+
+    Returns:
+        str: Identifiant du run (à passer à `finish_run`).
+    """
+    run_id = uuid.uuid4().hex
+    with _connect(db_path) as con:
+        con.execute(
+            f"""
+            INSERT INTO {LEDGER_TABLE}
+                (run_id, started_at, depts, failed_depts,
+                 stations_inserted, obs_inserted)
+            VALUES (?, ?, ?, ?, ?, ?)
+            """,
+            [
+                run_id,
+                started_at,
+                depts,
+                sorted(failed),
+                inserted.get("raw.stations", 0),
+                inserted.get("raw.obs_hourly", 0),
+            ],
+        )
+    return run_id
+
+
+def pending_rows(db_path: str) -> dict[str, int]:
+    """Lignes raw insérées depuis le dernier build réussi, par table.
+
+    Les runs interrompus ou dont le build a échoué sont comptés : leurs lignes
+    n'ont pas encore été propagées dans les marts.
+    """
+    sums = ", ".join(
+        f"coalesce(sum({column}), 0)" for column in INSERTED_COLUMNS.values()
+    )
+    with _connect(db_path) as con:
+        counts = con.execute(
+            f"""
+            SELECT {sums} FROM {LEDGER_TABLE}
+            WHERE started_at > coalesce(
+                (SELECT max(started_at) FROM {LEDGER_TABLE} WHERE dbt_status = ?),
+                '-infinity'::TIMESTAMPTZ
+            )
+            """,
+            [BUILT],
+        ).fetchone()
+    return dict(zip(INSERTED_COLUMNS, map(int, counts)))
+
+
+def finish_run(
+    db_path: str,
+    run_id: str,
+    dbt_status: str,
+    dbt_selection: list[str] | None = None,
+    published_version: str | None = None,
+) -> None:
+    """Clôt la ligne du run : issue du build, sélection dbt, version publiée."""
+    with _connect(db_path) as con:
+        con.execute(
+            f"""
+            UPDATE {LEDGER_TABLE}
+            SET finished_at = ?, dbt_status = ?, dbt_selection = ?,
+                published_version = ?
+            WHERE run_id = ?
+            """,
+            [
+                datetime.now(UTC),
+                dbt_status,
+                dbt_selection,
+                published_version,
+                run_id,
+            ],
+        )
@@ -0,0 +1,132 @@
+"""Cache de fetch conditionnel pour la liste des stations.
+
+La liste des stations change quelques fois par an : plutôt que de la
+re-télécharger et de la réécrire à chaque run, on garde à côté du warehouse
+un petit cache JSON (clé = URL) avec ETag / Last-Modified, empreinte SHA-256
+du contenu et date du dernier fetch.
+
+- dans le TTL : aucun appel API ;
+- au-delà : GET conditionnel (`If-None-Match` / `If-Modified-Since`) ;
+- 304 ou contenu identique (même empreinte) : pas d'écriture DuckDB.
+"""
+
+from __future__ import annotations
+
+import hashlib
+import io
+import json
+import os
+from datetime import UTC, datetime, timedelta
+from pathlib import Path
+
+import pyarrow as pa
+import requests
+
+from scripts.ingestion.fetch_meteofrance_paquetobs import (
+    ENDPOINTS,
+    TIMEOUT,
+    read_csv_stream,
+)
+
+# TTL par défaut pendant lequel la liste des stations n'est pas redemandée
+DEFAULT_STATIONS_TTL = timedelta(hours=24)
+
+
+class _HashingReader(io.RawIOBase):
+    """Flux lecture seule qui calcule le SHA-256 de ce qui le traverse."""
+
+    def __init__(self, raw: io.RawIOBase):
+        self.raw = raw
+        self.sha256 = hashlib.sha256()
+
+    def readable(self) -> bool:
+        return True
+
+    def readinto(self, buffer) -> int:
+        n = self.raw.readinto(buffer)
+        if n:
+            self.sha256.update(memoryview(buffer)[:n])
+        return n
+
+
+class FetchCache:
+    """Métadonnées de fetch conditionnel persistées dans un fichier JSON, clé = URL."""
+
+    def __init__(self, path: str | Path, ttl: timedelta = DEFAULT_STATIONS_TTL):
+        self.path = Path(path)
+        self.ttl = ttl
+        try:
+            self._entries: dict[str, dict] = json.loads(self.path.read_text())
+        except (FileNotFoundError, json.JSONDecodeError):
+            self._entries = {}
+
+    @classmethod
+    def next_to(cls, db_path: str, ttl: timedelta = DEFAULT_STATIONS_TTL) -> FetchCache:
+        """Cache rangé à côté du fichier DuckDB (un cache par warehouse)."""
+        return cls(Path(db_path).parent / ".fetch_cache.json", ttl)
+
+    def get(self, url: str) -> dict | None:
+        return self._entries.get(url)
+
+    def is_fresh(self, url: str) -> bool:
+        """True si l'URL a été vérifiée il y a moins de `ttl`."""
+        entry = self.get(url)
+        if not entry:
+            return False
+        fetched_at = datetime.fromisoformat(entry["fetched_at"])
+        return datetime.now(UTC) - fetched_at < self.ttl
+
+    def put(self, entry: dict) -> None:
+        """Enregistre l'entrée (clé `entry["url"]`) ; réécriture atomique du fichier."""
+        self._entries[entry["url"]] = entry
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        tmp = self.path.with_suffix(".tmp")
+        tmp.write_text(json.dumps(self._entries, indent=2, sort_keys=True))
+        os.replace(tmp, self.path)
+
+
+def fetch_stations_if_changed(
+    session: requests.Session, cache: FetchCache, force: bool = False
+) -> tuple[pa.Table | None, dict | None]:
+    """Récupère la liste des stations seulement si elle a changé.
+
+    Retourne (table, entrée de cache) :
+    - table None si rien n'a changé (TTL non écoulé, 304, ou même empreinte) ;
+    - l'entrée est à enregistrer via `cache.put` une fois l'écriture DuckDB
+      commitée (None si le TTL n'est pas écoulé : rien à enregistrer).
+
+    `force=True` ignore le TTL et l'empreinte (ex. table raw absente).
+    """
+    url = ENDPOINTS["stations"]
+    entry = cache.get(url) or {}
+    if not force and cache.is_fresh(url):
+        return None, None
+
+    headers = {}
+    if not force and entry.get("etag"):
+        headers["If-None-Match"] = entry["etag"]
+    if not force and entry.get("last_modified"):
+        headers["If-Modified-Since"] = entry["last_modified"]
+
+    now = datetime.now(UTC).isoformat()
+    with session.get(
+        url, params={"format": "csv"}, headers=headers, timeout=TIMEOUT, stream=True
+    ) as resp:
+        if resp.status_code == 304:
+            return None, {**entry, "url": url, "fetched_at": now}
+        resp.raise_for_status()
+        resp.raw.decode_content = True
+        resp.raw.auto_close = False
+        reader = _HashingReader(resp.raw)
+        table = read_csv_stream(reader)
+        new_entry = {
+            "url": url,
+            "etag": resp.headers.get("ETag"),
+            "last_modified": resp.headers.get("Last-Modified"),
+            "sha256": reader.sha256.hexdigest(),
+            "fetched_at": now,
+        }
+
+    if not force and new_entry["sha256"] == entry.get("sha256"):
+        return None, new_entry
+    return table, new_entry
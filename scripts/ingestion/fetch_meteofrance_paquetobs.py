@@ -5,29 +5,34 @@ Client fetch-only pour l'API Météo-France DPPaquetObs (Paquet Observations).
 
 Fonctionnalités :
 - /liste-stations (CSV)
-- /paquet/horaire (CSV)
+- /paquet/horaire (CSV), un département ou plusieurs en parallèle
+- limiteur de débit partagé (quota Météo-France, `Retry-After` sur 429)
+- parsing CSV en streaming vers des tables Arrow (sans tampon pandas)
 
-Dépendances : requests, pandas, python-dotenv
+Dépendances : requests, pyarrow, python-dotenv
 """
 
 from __future__ import annotations
 
 import argparse
 import io
+import logging
 import os
-from typing import Optional
+import threading
+import time
+from collections.abc import Iterable
+from concurrent.futures import ThreadPoolExecutor, as_completed
 
-import pandas as pd
+import pyarrow as pa
+import pyarrow.csv as pacsv
 import requests
+from dotenv import load_dotenv
 from requests.adapters import HTTPAdapter
 from urllib3.util.retry import Retry
 
-from dotenv import load_dotenv
-
-import logging
-
 logging.basicConfig(level=logging.INFO)
 logging.getLogger("urllib3").setLevel(logging.DEBUG)
+logger = logging.getLogger(__name__)
 
 # --------------------------------------------------------------------------- #
 # Chargement de l'environnement
@@ -40,12 +45,45 @@ load_dotenv()
 # Constantes
 # --------------------------------------------------------------------------- #
 
-BASE_URL: str = "https://public-api.meteofrance.fr/public/DPPaquetObs/v1"
+# Surchargeable (ex. serveur local `scripts.mock.paquetobs_server`)
+BASE_URL: str = os.getenv(
+    "METEOFRANCE_BASE_URL", "https://public-api.meteofrance.fr/public/DPPaquetObs/v1"
+)
 USER_AGENT: str = "dbt-weather-poc"
 
 # Timeout (connect, read)
 TIMEOUT: tuple[int, int] = (10, 60)
 
+# Taille des blocs lus sur le flux HTTP et parsés par Arrow
+CSV_BLOCK_SIZE: int = 1 << 20
+
+# Quota du portail API Météo-France (offre publique) : 50 requêtes / minute
+# (relevable contre le serveur local pour mesurer le débit)
+RATE_LIMIT_PER_MINUTE: int = int(os.getenv("METEOFRANCE_RATE_LIMIT", "50"))
+
+# Nombre de départements récupérés en parallèle (et taille du pool HTTP)
+DEFAULT_WORKERS: int = 8
+
+# Retries sur erreurs serveur / réseau : nombre et backoff exponentiel
+# (0.8, 1.6, 3.2, 6.4...)
+RETRY_STATUSES: tuple[int, ...] = (500, 502, 503, 504)
+MAX_RETRIES: int = 5
+BACKOFF_FACTOR: float = 0.8
+
+# Départements couverts par DPPaquetObs (métropole + Corse + outre-mer)
+ALL_DEPTS: tuple[str, ...] = (
+    *(str(n) for n in range(1, 20)),
+    "2A",
+    "2B",
+    *(str(n) for n in range(21, 96)),
+    "971",
+    "972",
+    "973",
+    "974",
+    "975",
+    "976",
+)
+
 ENDPOINTS = {
     "stations": f"{BASE_URL}/liste-stations",
     "hourly": f"{BASE_URL}/paquet/horaire",
@@ -64,13 +102,133 @@ def _require_env(var_name: str) -> str:
     return value
 
 
+# --------------------------------------------------------------------------- #
+# Limiteur de débit
+# --------------------------------------------------------------------------- #
+
+
+class RateLimiter:
+    """Token bucket thread-safe partagé par toutes les requêtes d'une session.
+
+    Chaque requête consomme un jeton ; les jetons se rechargent au rythme du
+    quota. Un 429 suspend *tous* les threads pendant la durée `Retry-After`.
+    """
+
+    def __init__(self, rate_per_minute: int = RATE_LIMIT_PER_MINUTE, burst: int = 1):
+        self.rate = rate_per_minute / 60.0
+        self.capacity = float(max(burst, 1))
+        self._tokens = self.capacity
+        self._updated = time.monotonic()
+        self._paused_until = 0.0
+        self._lock = threading.Lock()
+
+    def acquire(self) -> None:
+        """Bloque jusqu'à ce qu'un jeton soit disponible, puis le consomme."""
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self._tokens = min(
+                    self.capacity, self._tokens + (now - self._updated) * self.rate
+                )
+                self._updated = now
+                if now >= self._paused_until and self._tokens >= 1:
+                    self._tokens -= 1
+                    return
+                wait = max(self._paused_until - now, (1 - self._tokens) / self.rate)
+            time.sleep(wait)
+
+    def pause(self, seconds: float) -> None:
+        """Suspend l'émission de requêtes pendant `seconds` (ex. `Retry-After`)."""
+        with self._lock:
+            self._paused_until = max(self._paused_until, time.monotonic() + seconds)
+            self._tokens = 0.0
+
+
+class _RateLimitedAdapter(HTTPAdapter):
+    """HTTPAdapter qui passe par le `RateLimiter` et gère lui-même les retries.
+
+    urllib3 ne retente rien ici : ses retries partiraient hors limiteur. Chaque
+    tentative consomme un jeton. Un 429 met tout le limiteur en pause
+    (`Retry-After`) ; un 5xx ou une erreur réseau est retenté après un backoff
+    exponentiel, dans le seul thread concerné.
+    """
+
+    def __init__(
+        self,
+        limiter: RateLimiter,
+        max_429: int = 5,
+        max_retries: int = MAX_RETRIES,
+        backoff_factor: float = BACKOFF_FACTOR,
+        **kwargs,
+    ):
+        self.limiter = limiter
+        self.max_429 = max_429
+        self.max_errors = max_retries
+        self.backoff_factor = backoff_factor
+        super().__init__(max_retries=Retry(total=0, raise_on_status=False), **kwargs)
+
+    def _retry_after(self, resp: requests.Response, default: float) -> float:
+        header = resp.headers.get("Retry-After")
+        return self.max_retries.parse_retry_after(header) if header else default
+
+    def send(self, request, **kwargs):
+        n_429 = n_errors = 0
+        while True:
+            self.limiter.acquire()
+            try:
+                resp = super().send(request, **kwargs)
+            except (requests.ConnectionError, requests.Timeout) as exc:
+                if n_errors >= self.max_errors:
+                    raise
+                n_errors += 1
+                wait = self.backoff_factor * 2 ** (n_errors - 1)
+                logger.warning(
+                    "%s, nouvel essai dans %.1fs (%s)", exc, wait, request.url
+                )
+                time.sleep(wait)
+                continue
+
+            if resp.status_code == 429 and n_429 < self.max_429:
+                retry_after = self._retry_after(resp, 2.0**n_429)
+                n_429 += 1
+                logger.warning(
+                    "429 reçu, pause du limiteur pendant %.1fs (%s)",
+                    retry_after,
+                    request.url,
+                )
+                self.limiter.pause(retry_after)
+            elif resp.status_code in RETRY_STATUSES and n_errors < self.max_errors:
+                n_errors += 1
+                wait = self._retry_after(
+                    resp, self.backoff_factor * 2 ** (n_errors - 1)
+                )
+                logger.warning(
+                    "%s reçu, nouvel essai dans %.1fs (%s)",
+                    resp.status_code,
+                    wait,
+                    request.url,
+                )
+                time.sleep(wait)
+            else:
+                return resp
+            resp.close()
+
+
 # --------------------------------------------------------------------------- #
 # Session HTTP
 # --------------------------------------------------------------------------- #
 
 
-def open_session_paquetobs(apikey: Optional[str] = None) -> requests.Session:
-    """Crée une session HTTP authentifiée (header `apikey`)."""
+def open_session_paquetobs(
+    apikey: str | None = None,
+    limiter: RateLimiter | None = None,
+    pool_maxsize: int = DEFAULT_WORKERS,
+) -> requests.Session:
+    """Crée une session HTTP authentifiée (header `apikey`).
+
+    La session est partageable entre threads : `pool_maxsize` connexions
+    keep-alive vers l'API, et un `limiter` optionnel appliqué à chaque requête.
+    """
     token = apikey or _require_env("METEOFRANCE_TOKEN")
     s = requests.Session()
     s.headers.update(
@@ -80,17 +238,22 @@ def open_session_paquetobs(apikey: Optional[str] = None) -> requests.Session:
             "User-Agent": USER_AGENT,
         }
     )
-    retry = Retry(
-        total=5,
-        connect=5,
-        read=5,
-        backoff_factor=0.8,  # exponential backoff: 0.8, 1.6, 3.2, 6.4...
-        status_forcelist=[429, 500, 502, 503, 504],
-        allowed_methods={"GET"},
-        raise_on_status=False,
-        respect_retry_after_header=True,
-    )
-    adapter = HTTPAdapter(max_retries=retry)
+    pool = {"pool_connections": pool_maxsize, "pool_maxsize": pool_maxsize}
+    if limiter:
+        # Retries (429, 5xx, réseau) dans l'adaptateur : un jeton par tentative
+        adapter = _RateLimitedAdapter(limiter, **pool)
+    else:
+        retry = Retry(
+            total=MAX_RETRIES,
+            connect=MAX_RETRIES,
+            read=MAX_RETRIES,
+            backoff_factor=BACKOFF_FACTOR,
+            status_forcelist=[429, *RETRY_STATUSES],
+            allowed_methods={"GET"},
+            raise_on_status=False,
+            respect_retry_after_header=True,
+        )
+        adapter = HTTPAdapter(max_retries=retry, **pool)
     s.mount("https://", adapter)
     s.mount("http://", adapter)
     return s
@@ -102,8 +265,59 @@ def open_session_paquetobs(apikey: Optional[str] = None) -> requests.Session:
 
 
 def normalize_dept_code(dept: str) -> str:
-    """Normalise le code département."""
-    return str(dept).strip().upper()
+    """Normalise le code département (majuscules, sans zéro initial : '09' -> '9')."""
+    code = str(dept).strip().upper()
+    if code.isdigit():
+        return code.lstrip("0") or code
+    return code
+
+
+def parse_depts(spec: str) -> list[str]:
+    """Parse `all` ou `09,75,2A` en codes normalisés (ordre conservé, sans doublon)."""
+    if spec.strip().lower() == "all":
+        return list(ALL_DEPTS)
+    codes = [normalize_dept_code(c) for c in spec.split(",") if c.strip()]
+    if not codes:
+        raise ValueError(f"Aucun département dans : {spec!r}")
+    return list(dict.fromkeys(codes))
+
+
+# --------------------------------------------------------------------------- #
+# Parsing CSV (streaming)
+# --------------------------------------------------------------------------- #
+
+
+def read_csv_stream(stream: io.RawIOBase) -> pa.Table:
+    """Parse un flux CSV `;` bloc par bloc vers une table Arrow — RAW inchangé.
+
+    L'en-tête est lu à part pour forcer toutes les colonnes en texte (comme
+    `dtype=str`) sans inférence ; les champs vides deviennent NULL.
+    """
+    buffered = io.BufferedReader(stream, buffer_size=CSV_BLOCK_SIZE)
+    header = buffered.readline().decode("utf-8-sig").rstrip("\r\n")
+    if not header:
+        return pa.table({})
+    columns = [c.strip('"') for c in header.split(";")]
+    reader = pacsv.open_csv(
+        buffered,
+        read_options=pacsv.ReadOptions(column_names=columns, block_size=CSV_BLOCK_SIZE),
+        parse_options=pacsv.ParseOptions(delimiter=";"),
+        convert_options=pacsv.ConvertOptions(
+            column_types={c: pa.string() for c in columns},
+            strings_can_be_null=True,
+        ),
+    )
+    return reader.read_all()
+
+
+def _get_csv(session: requests.Session, url: str, params: dict) -> pa.Table:
+    """GET en streaming (`stream=True`) et parse du corps sans le bufferiser."""
+    with session.get(url, params=params, timeout=TIMEOUT, stream=True) as resp:
+        resp.raise_for_status()  # lève une exception si HTTP != 2xx
+        resp.raw.decode_content = True  # décompression gzip éventuelle à la volée
+        # EOF lisible par le BufferedReader ; la réponse est fermée par le `with`
+        resp.raw.auto_close = False
+        return read_csv_stream(resp.raw)
 
 
 # --------------------------------------------------------------------------- #
@@ -111,32 +325,59 @@ def normalize_dept_code(dept: str) -> str:
 # --------------------------------------------------------------------------- #
 
 
-def fetch_stations(session: requests.Session) -> pd.DataFrame:
+def fetch_stations(session: requests.Session) -> pa.Table:
     """Récupère la liste des stations (CSV) — RAW inchangé."""
-    resp = session.get(ENDPOINTS["stations"], params={"format": "csv"}, timeout=TIMEOUT)
-    resp.raise_for_status()
-    # Lire depuis bytes pour éviter les surprises d'encodage
-    df = pd.read_csv(io.BytesIO(resp.content), sep=";", dtype=str, low_memory=False)
-    return df
+    return _get_csv(session, ENDPOINTS["stations"], {"format": "csv"})
 
 
-def fetch_hourly_for_dept(session: requests.Session, dept: str) -> pd.DataFrame:
+def fetch_hourly_for_dept(session: requests.Session, dept: str) -> pa.Table:
     """Récupère les observations horaires (24h) d’un département (CSV).
 
-    Retourne une DataFrame RAW :
+    Retourne une table Arrow RAW :
     - colonnes exactement telles que renvoyées par l'API
     - ajoute `dept_code` uniquement si absent
     """
     dept_code = normalize_dept_code(dept)
-    resp = session.get(
+    table = _get_csv(
+        session,
         ENDPOINTS["hourly"],
-        params={"id-departement": dept_code, "format": "csv"},
-        timeout=TIMEOUT,
+        {"id-departement": dept_code, "format": "csv"},
     )
-    resp.raise_for_status()  # lève une exception si HTTP != 2xx
-    df = pd.read_csv(io.BytesIO(resp.content), sep=";", dtype=str, low_memory=False)
-    df["dept_code"] = dept_code
-    return df
+    if "dept_code" not in table.column_names:
+        table = table.append_column(
+            "dept_code", pa.repeat(dept_code, table.num_rows).cast(pa.string())
+        )
+    return table
+
+
+def fetch_hourly_for_depts(
+    session: requests.Session,
+    depts: Iterable[str],
+    max_workers: int = DEFAULT_WORKERS,
+) -> tuple[dict[str, pa.Table], dict[str, Exception]]:
+    """Récupère plusieurs départements en parallèle sur une même session.
+
+    Le débit est borné par le limiteur monté sur la session (s'il y en a un) ;
+    `max_workers` borne seulement le nombre de requêtes en vol.
+
+    Retourne (résultats par département, erreurs par département) : un
+    département en échec n'interrompt pas les autres.
+    """
+    results: dict[str, pa.Table] = {}
+    errors: dict[str, Exception] = {}
+    codes = list(dict.fromkeys(normalize_dept_code(d) for d in depts))
+    with ThreadPoolExecutor(max_workers=max_workers) as pool:
+        futures = {
+            pool.submit(fetch_hourly_for_dept, session, code): code for code in codes
+        }
+        for fut in as_completed(futures):
+            code = futures[fut]
+            try:
+                results[code] = fut.result()
+            except Exception as exc:  # noqa: BLE001 - on remonte l'erreur par département
+                logger.error("Département %s en échec : %s", code, exc)
+                errors[code] = exc
+    return results, errors
 
 
 # --------------------------------------------------------------------------- #
@@ -180,12 +421,12 @@ def main() -> None:
 
     if args.list_stations:
         df_st = fetch_stations(session)
-        print(df_st.head(args.head).to_string(index=False))
+        print(df_st.slice(0, args.head).to_pandas().to_string(index=False))
         print(f"\nStations : {len(df_st):,}")
 
     if args.dept:
         df_hr = fetch_hourly_for_dept(session, args.dept)
-        print(df_hr.head(args.head).to_string(index=False))
+        print(df_hr.slice(0, args.head).to_pandas().to_string(index=False))
         print(
             f"\nObservations horaires pour le département {normalize_dept_code(args.dept)} : {len(df_hr):,}"
         )
@@ -0,0 +1,143 @@
+"""Zone de landing Parquet (partitionnement Hive) pour les observations horaires.
+
+Les lignes nouvelles de chaque fetch sont déposées, typées et compressées
+(zstd), sous :
+
+    <root>/obs_hourly/dept=XX/date=YYYY-MM-DD/obs_<uuid>.parquet
+
+Les lecteurs (dbt, notebooks…) lisent ces fichiers via
+`read_parquet(..., hive_partitioning=true)` sans prendre le verrou du fichier
+DuckDB, et peuvent élaguer par département / jour.
+
+Chaque fetch couvre une fenêtre glissante de 24 h, mais seules les lignes que
+raw n'avait pas encore sont déposées : un run sans nouveauté n'écrit rien.
+Chaque run ajoute tout de même un petit fichier par partition touchée ; la
+commande `compact` les fusionne en un seul, dédoublonné sur la clé raw.
+
+Usage :
+    python -m scripts.ingestion.landing compact [--root data/landing]
+"""
+
+from __future__ import annotations
+
+import argparse
+import os
+import uuid
+from datetime import datetime
+from pathlib import Path
+
+import duckdb
+import pyarrow as pa
+
+from scripts.ingestion.raw_schema import OBS_HOURLY_TYPES, typed_select
+
+DEFAULT_LANDING_ROOT: str = os.getenv("LANDING_PATH", "data/landing")
+
+OBS_HOURLY_PK: tuple[str, ...] = ("validity_time", "geo_id_insee", "reference_time")
+
+PARQUET_OPTIONS = "FORMAT parquet, COMPRESSION zstd"
+
+
+def _connect() -> duckdb.DuckDBPyConnection:
+    """Connexion DuckDB en mémoire (aucun verrou sur le warehouse), en UTC."""
+    con = duckdb.connect()
+    con.execute("SET TimeZone = 'UTC';")
+    return con
+
+
+def land_obs_hourly(table: pa.Table, root: str, load_time: datetime) -> None:
+    """Dépose un fetch d'observations horaires dans la zone de landing.
+
+    Les colonnes sont converties vers les types déclarés (`raw_schema`) ; la
+    partition `dept` est le code INSEE sur au moins deux caractères ('9' -> '09',
+    '971' inchangé), `date` le jour UTC de `validity_time`.
+
+    Args:
+        table (pa.Table): Fetch brut (colonnes texte), avec `dept_code`.
+        root (str): Racine de la zone de landing.
+        load_time (datetime): Horodatage d'ingestion (identique à raw.*).
+    """
+    if table.num_rows == 0:
+        return
+    target = Path(root) / "obs_hourly"
+    target.mkdir(parents=True, exist_ok=True)
+
+    with _connect() as con:
+        con.register("df", table)
+        con.execute(
+            f"""
+            COPY (
+                SELECT
+                    {typed_select(table.column_names, OBS_HOURLY_TYPES)},
+                    CAST($load_time AS TIMESTAMPTZ) AS load_time,
+                    CASE WHEN length(dept_code) = 1 THEN '0' || dept_code
+                         ELSE dept_code END AS dept,
+                    CAST(try_cast(validity_time AS TIMESTAMPTZ) AS DATE) AS date
+                FROM df
+            ) TO '{target}' (
+                {PARQUET_OPTIONS},
+                PARTITION_BY (dept, date),
+                FILENAME_PATTERN 'obs_{{uuid}}',
+                APPEND
+            );
+            """,
+            {"load_time": load_time},
+        )
+
+
+def compact_partition(partition: Path) -> int:
+    """Fusionne les fichiers d'une partition en un seul fichier dédoublonné.
+
+    Pour une même clé, la première version chargée est conservée (même règle
+    que `INSERT OR IGNORE` côté raw). Le nouveau fichier est écrit sous un nom
+    temporaire puis renommé avant la suppression des anciens : un lecteur voit
+    au pire des doublons, jamais une partition vide.
+
+    Returns:
+        int: Nombre de fichiers fusionnés (0 si rien à faire).
+    """
+    files = sorted(partition.glob("*.parquet"))
+    if len(files) < 2:
+        return 0
+
+    pk = ", ".join(OBS_HOURLY_PK)
+    tmp = partition / f".compact_{uuid.uuid4().hex}.tmp"
+    with _connect() as con:
+        con.execute(
+            f"""
+            COPY (
+                SELECT *
+                FROM read_parquet($files, union_by_name = true)
+                QUALIFY row_number() OVER (PARTITION BY {pk} ORDER BY load_time) = 1
+                ORDER BY geo_id_insee, validity_time
+            ) TO '{tmp}' ({PARQUET_OPTIONS});
+            """,
+            {"files": [str(f) for f in files]},
+        )
+    tmp.rename(partition / f"obs_compact_{uuid.uuid4().hex}.parquet")
+    for f in files:
+        f.unlink()
+    return len(files)
+
+
+def compact_landing(root: str) -> None:
+    """Compacte toutes les partitions `dept=*/date=*` de la zone de landing."""
+    for partition in sorted((Path(root) / "obs_hourly").glob("dept=*/date=*")):
+        merged = compact_partition(partition)
+        if merged:
+            print(f"{partition}: {merged} fichiers -> 1")
+
+
+def main() -> None:
+    """CLI : compaction de la zone de landing."""
+    ap = argparse.ArgumentParser(description="Zone de landing Parquet (obs_hourly)")
+    ap.add_argument("command", choices=["compact"])
+    ap.add_argument("--root", default=DEFAULT_LANDING_ROOT)
+    args = ap.parse_args()
+
+    if args.command == "compact":
+        compact_landing(args.root)
+
+
+if __name__ == "__main__":
+    main()
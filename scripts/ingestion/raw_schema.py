@@ -0,0 +1,116 @@
+"""Schéma typé déclaré des tables brutes Météo-France.
+
+Les fetchers renvoient toutes les colonnes en texte (RAW inchangé). Ce module
+déclare le type cible de chaque colonne connue de l'API, utilisé quand on
+écrit une version typée des données (landing Parquet, mode `--typed` de raw.*).
+Une colonne absente de ce schéma (nouvelle colonne API) reste en VARCHAR.
+"""
+
+from __future__ import annotations
+
+from collections.abc import Iterable
+
+# /paquet/horaire — types DuckDB cibles
+OBS_HOURLY_TYPES: dict[str, str] = {
+    # Ids / localisation
+    "geo_id_insee": "VARCHAR",
+    "lat": "DOUBLE",
+    "lon": "DOUBLE",
+    # Timestamps (ISO 8601 / UTC)
+    "reference_time": "TIMESTAMPTZ",
+    "insert_time": "TIMESTAMPTZ",
+    "validity_time": "TIMESTAMPTZ",
+    # Températures (K)
+    "t": "DOUBLE",
+    "td": "DOUBLE",
+    "tx": "DOUBLE",
+    "tn": "DOUBLE",
+    # Humidité (%)
+    "u": "INTEGER",
+    "ux": "INTEGER",
+    "un": "INTEGER",
+    # Vent (degrés, m/s)
+    "dd": "INTEGER",
+    "ff": "DOUBLE",
+    "dxy": "INTEGER",
+    "fxy": "DOUBLE",
+    "dxi": "INTEGER",
+    "fxi": "DOUBLE",
+    # Précipitations (mm)
+    "rr1": "DOUBLE",
+    # Températures du sol (K)
+    "t_10": "DOUBLE",
+    "t_20": "DOUBLE",
+    "t_50": "DOUBLE",
+    "t_100": "DOUBLE",
+    # Visibilité (m), état du sol, neige (m), nébulosité
+    "vv": "INTEGER",
+    "etat_sol": "INTEGER",
+    "sss": "DOUBLE",
+    "n": "INTEGER",
+    # Ensoleillement / rayonnement
+    "insolh": "DOUBLE",
+    "ray_glo01": "DOUBLE",
+    # Pressions (Pa)
+    "pres": "DOUBLE",
+    "pmer": "DOUBLE",
+    # Technique
+    "dept_code": "VARCHAR",
+}
+
+
+# /liste-stations — Id_omm garde ses zéros initiaux, Date_ouverture reste texte
+STATIONS_TYPES: dict[str, str] = {
+    "Id_station": "VARCHAR",
+    "Id_omm": "VARCHAR",
+    "Nom_usuel": "VARCHAR",
+    "Latitude": "DOUBLE",
+    "Longitude": "DOUBLE",
+    "Altitude": "DOUBLE",
+    "Date_ouverture": "VARCHAR",
+    "Pack": "VARCHAR",
+}
+
+# Schéma déclaré par table raw
+RAW_TYPES: dict[str, dict[str, str]] = {
+    "raw.obs_hourly": OBS_HOURLY_TYPES,
+    "raw.stations": STATIONS_TYPES,
+}
+
+# Élargissement quand une valeur ne tient plus dans le type courant
+WIDER_TYPE: dict[str, str] = {
+    "INTEGER": "DOUBLE",
+    "DOUBLE": "VARCHAR",
+    "TIMESTAMPTZ": "VARCHAR",
+}
+
+
+def fits_type(col: str, target: str) -> str:
+    """Expression SQL : la valeur de `col` (hors vide / NULL) tient dans `target`.
+
+    Un INTEGER exige une valeur entière : `try_cast('85.5' AS INTEGER)` arrondit
+    silencieusement à 86.
+    """
+    if target == "VARCHAR":
+        return "true"
+    fits = f'try_cast("{col}" AS {target}) IS NOT NULL'
+    if target == "INTEGER":
+        fits += f' AND try_cast("{col}" AS DOUBLE) = try_cast("{col}" AS {target})'
+    empty = f"nullif(trim(CAST(\"{col}\" AS VARCHAR)), '') IS NULL"
+    return f"({empty} OR ({fits}))"
+
+
+def typed_select(columns: Iterable[str], types: dict[str, str]) -> str:
+    """Liste SQL qui convertit chaque colonne texte vers son type déclaré.
+
+    `try_cast` : une valeur non conforme devient NULL au lieu de faire échouer
+    le chargement (même règle que les macros `safe_*` du staging dbt).
+    """
+    exprs = []
+    for col in columns:
+        target = types.get(col, "VARCHAR")
+        if target == "VARCHAR":
+            exprs.append(f'"{col}"')
+        else:
+            exprs.append(f'try_cast("{col}" AS {target}) AS "{col}"')
+    return ",\n    ".join(exprs)
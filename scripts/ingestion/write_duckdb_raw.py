@@ -1,15 +1,50 @@
 #!/usr/bin/env python3
 # -*- coding: utf-8 -*-
-"""Write DataFrames from the Météo-France Paquet API into DuckDB (raw.*)"""
+"""Write Arrow tables from the Météo-France Paquet API into DuckDB (raw.*)"""
 
 from __future__ import annotations
 import argparse
 import os
-from typing import Sequence
+from datetime import timedelta
+from typing import Self, Sequence
 import duckdb
 import pandas as pd
+import pyarrow as pa
 from dotenv import load_dotenv
 
+from scripts.ingestion.raw_schema import (
+    RAW_TYPES,
+    WIDER_TYPE,
+    fits_type,
+    typed_select,
+)
+
+# Historique des schémas des tables raw (une ligne par version)
+SCHEMA_VERSIONS = "raw._schema_versions"
+SCHEMA_VERSIONS_DDL = """
+    table_name VARCHAR,
+    version INTEGER,
+    source_columns VARCHAR[],
+    table_columns VARCHAR[],
+    added_columns VARCHAR[],
+    vanished_columns VARCHAR[],
+    recorded_at TIMESTAMPTZ
+"""
+
+# Lignes écartées en mode typé : clé absente ou non convertible dans son type
+REJECTED_ROWS = "raw._rejected_rows"
+REJECTED_ROWS_DDL = """
+    table_name VARCHAR,
+    row_json VARCHAR,
+    load_time TIMESTAMPTZ
+"""
+
+# Clé logique de chaque table raw (portée par un index unique `<table>_pk`)
+RAW_PRIMARY_KEYS: dict[str, list[str]] = {
+    "raw.stations": ["Id_station"],
+    "raw.obs_hourly": ["validity_time", "geo_id_insee", "reference_time"],
+}
+
 
 # --------------------------------------------------------------------------- #
 # Utils
@@ -28,81 +63,612 @@ def _connect(db_path: str) -> duckdb.DuckDBPyConnection:
     return con
 
 
-def write_raw_dedup(
-    df: pd.DataFrame, table: str, pk_cols: Sequence[str], db_path: str
+def _has_pk_index(con: duckdb.DuckDBPyConnection, table: str) -> bool:
+    schema, name = table.split(".")
+    return bool(
+        con.execute(
+            "SELECT 1 FROM duckdb_indexes() WHERE schema_name = ? AND index_name = ?",
+            [schema, f"{name}_pk"],
+        ).fetchone()
+    )
+
+
+def _count_pk_duplicates(
+    con: duckdb.DuckDBPyConnection, table: str, pk_cols: Sequence[str]
+) -> int:
+    """Number of rows of `table` repeating an already present `pk_cols` key."""
+    pk = ", ".join(pk_cols)
+    (extra,) = con.execute(f"""
+        SELECT coalesce(sum(n - 1), 0)
+        FROM (SELECT count(*) AS n FROM {table} GROUP BY {pk} HAVING n > 1);
+    """).fetchone()
+    return int(extra)
+
+
+def _ensure_pk_index(
+    con: duckdb.DuckDBPyConnection, table: str, pk_cols: Sequence[str]
 ) -> None:
-    """Insert a DataFrame into a DuckDB table with PK-based deduplication.
+    """Create the unique ART index backing `pk_cols` on `table` if it is missing.
+
+    No row is ever deleted here: a table created before the index existed and
+    holding duplicates must first go through `migrate_pk_indexes`.
 
     Args:
-        df (pd.DataFrame): Input dataset.
+        con (duckdb.DuckDBPyConnection): Open connection.
+        table (str): Fully qualified table name (e.g. 'raw.obs_hourly').
+        pk_cols (Sequence[str]): Columns used as logical primary key.
+
+    Raises:
+        RuntimeError: If `table` holds duplicate keys (migration required).
+    """
+    if _has_pk_index(con, table):
+        return
+    duplicates = _count_pk_duplicates(con, table, pk_cols)
+    if duplicates:
+        raise RuntimeError(
+            f"{table} holds {duplicates:,} duplicate rows on ({', '.join(pk_cols)}); "
+            "run the one-time migration first: make dwh-migrate-pk"
+        )
+    _, name = table.split(".")
+    con.execute(f"CREATE UNIQUE INDEX {name}_pk ON {table} ({', '.join(pk_cols)});")
+
+
+def _table_types(con: duckdb.DuckDBPyConnection, table: str) -> dict[str, str]:
+    """Column -> DuckDB type of `table`, in table order (load_time excluded)."""
+    schema, name = table.split(".")
+    rows = con.execute(
+        "SELECT column_name, data_type FROM information_schema.columns"
+        " WHERE table_schema = ? AND table_name = ? ORDER BY ordinal_position",
+        [schema, name],
+    ).fetchall()
+    aliases = {"TIMESTAMP WITH TIME ZONE": "TIMESTAMPTZ"}
+    return {col: aliases.get(t, t) for col, t in rows if col != "load_time"}
+
+
+def _widen(
+    con: duckdb.DuckDBPyConnection, relation: str, types: dict[str, str]
+) -> dict[str, str]:
+    """Return, for each typed column of `types`, the narrowest type holding `relation`.
+
+    Types are only ever widened (INTEGER -> DOUBLE -> VARCHAR, TIMESTAMPTZ ->
+    VARCHAR) so that a value the current type cannot hold is kept instead of
+    being turned into NULL. Only columns that need a change are returned.
+    """
+    widened: dict[str, str] = {}
+    pending = {c: t for c, t in types.items() if t in WIDER_TYPE}
+    while pending:
+        checks = ", ".join(f"bool_and({fits_type(c, t)})" for c, t in pending.items())
+        fits = con.execute(f"SELECT {checks} FROM {relation}").fetchone()
+        pending = {
+            c: WIDER_TYPE[t] for (c, t), ok in zip(pending.items(), fits) if ok is False
+        }
+        widened.update(pending)
+        pending = {c: t for c, t in pending.items() if t in WIDER_TYPE}
+    return widened
+
+
+def _key_fits(key_types: dict[str, str]) -> str:
+    """SQL predicate: every typed key column of the row converts to its type.
+
+    Key columns are never widened: a key stored as text would no longer match
+    the same key sent by the API (`2026-01-01T00:00:00Z` vs the text rendering
+    of a TIMESTAMPTZ), and the unique index would stop deduplicating.
+    """
+    checks = [
+        f'try_cast("{c}" AS {t}) IS NOT NULL'
+        for c, t in key_types.items()
+        if t != "VARCHAR"
+    ]
+    return " AND ".join(checks) or "true"
+
+
+def _reject_rows(
+    con: duckdb.DuckDBPyConnection,
+    relation: str,
+    table: str,
+    key_types: dict[str, str],
+    load_time: pd.Timestamp,
+) -> int:
+    """Copy the rows of `relation` whose key does not fit `key_types` to raw._rejected_rows.
+
+    Returns:
+        int: Number of rejected rows (the caller filters or deletes them).
+    """
+    predicate = _key_fits(key_types)
+    if predicate == "true":
+        return 0
+    con.execute(f"CREATE TABLE IF NOT EXISTS {REJECTED_ROWS} ({REJECTED_ROWS_DDL});")
+    (rejected,) = con.execute(
+        f"""
+        INSERT INTO {REJECTED_ROWS}
+        SELECT $table, CAST(to_json(r) AS VARCHAR), CAST($load_time AS TIMESTAMPTZ)
+        FROM {relation} AS r
+        WHERE NOT ({predicate});
+        """,
+        {"table": table, "load_time": load_time},
+    ).fetchone()
+    if rejected:
+        print(
+            f"{table}: {rejected:,} rows with an unusable key moved to {REJECTED_ROWS}"
+        )
+    return rejected
+
+
+def _retype_table(
+    con: duckdb.DuckDBPyConnection,
+    table: str,
+    types: dict[str, str],
+    pk_cols: Sequence[str],
+) -> None:
+    """Rebuild `table` with `types`, then restore its PK index.
+
+    DuckDB cannot ALTER the type of a column on an indexed table, and an index
+    name cannot be reused after a DROP INDEX within the same transaction, so the
+    table is rebuilt instead (CTAS + rename): the change stays atomic with the
+    writer transaction.
+    """
+    schema, name = table.split(".")
+    tmp = f"{schema}.{name}__retype"
+    select = ", ".join(f'try_cast("{c}" AS {t}) AS "{c}"' for c, t in types.items())
+    con.execute(f"""
+        CREATE TABLE {tmp} AS
+        SELECT {select}, load_time FROM {table} ORDER BY rowid;
+    """)
+    con.execute(f"DROP TABLE {table};")
+    con.execute(f"ALTER TABLE {tmp} RENAME TO {name};")
+    _ensure_pk_index(con, table, pk_cols)
+
+
+def _record_schema_version(
+    con: duckdb.DuckDBPyConnection,
+    table: str,
+    source_columns: Sequence[str],
+    load_time: pd.Timestamp,
+    force: bool = False,
+) -> None:
+    """Append a version to raw._schema_versions when the schema of `table` moved.
+
+    A version is recorded when the table was created or retyped (`force`), or
+    when the API payload gained or lost columns since the last version.
+    """
+    con.execute(
+        f"CREATE TABLE IF NOT EXISTS {SCHEMA_VERSIONS} ({SCHEMA_VERSIONS_DDL});"
+    )
+    last = con.execute(
+        f"SELECT version, source_columns FROM {SCHEMA_VERSIONS}"
+        " WHERE table_name = ? ORDER BY version DESC LIMIT 1",
+        [table],
+    ).fetchone()
+    version, previous = last if last else (0, [])
+    added = [c for c in source_columns if c not in previous]
+    vanished = [c for c in previous if c not in source_columns]
+    if not (force or added or vanished):
+        return
+    con.execute(
+        f"INSERT INTO {SCHEMA_VERSIONS} VALUES (?, ?, ?, ?, ?, ?, ?)",
+        [
+            table,
+            version + 1,
+            list(source_columns),
+            [f"{c} {t}" for c, t in _table_types(con, table).items()],
+            added if last else [],
+            vanished,
+            load_time,
+        ],
+    )
+
+
+# --------------------------------------------------------------------------- #
+# Writer
+# --------------------------------------------------------------------------- #
+class RawWriter:
+    """Write any number of datasets into raw.* over one connection and one transaction.
+
+    The warehouse is opened once and every write runs inside the same
+    transaction, committed on exit or rolled back if an exception escapes the
+    block, so a failed run leaves raw untouched (schema changes included).
+
+    Before each insert the table schema is reconciled with the payload: new API
+    columns are added, vanished ones are left NULL, and typed columns are
+    widened when a value no longer fits. Key columns are never widened: rows
+    whose key does not convert are moved to raw._rejected_rows instead. With
+    `typed=True`, tables are created with the declared types of
+    `raw_schema.RAW_TYPES` (text tables from older runs are migrated once).
+    Schema changes are recorded in raw._schema_versions.
+
+    Every row written by the same writer shares one `load_time`.
+
+    Example:
+        with RawWriter("data/warehouse.duckdb") as writer:
+            writer.write(df_st, "raw.stations", ["Id_station"])
+            writer.write(df_hr, "raw.obs_hourly", pk_hr)
+    """
+
+    def __init__(self, db_path: str, typed: bool = False):
+        self.db_path = db_path
+        self.typed = typed
+        self.load_time = pd.Timestamp.now(tz="UTC")
+        self.con: duckdb.DuckDBPyConnection | None = None
+        self._indexed: set[str] = set()
+
+    def __enter__(self) -> Self:
+        self.con = _connect(self.db_path)
+        self.con.execute("BEGIN TRANSACTION;")
+        return self
+
+    def __exit__(self, exc_type, exc, tb) -> None:
+        try:
+            self.con.execute("ROLLBACK;" if exc_type else "COMMIT;")
+        finally:
+            self.con.close()
+            self.con = None
+
+    def has_table(self, table: str) -> bool:
+        """True if the fully qualified `table` exists in the warehouse."""
+        schema, name = table.split(".")
+        return bool(
+            self.con.execute(
+                "SELECT 1 FROM information_schema.tables"
+                " WHERE table_schema = ? AND table_name = ?",
+                [schema, name],
+            ).fetchone()
+        )
+
+    def _prepare(
+        self, table: str, pk_cols: Sequence[str], columns: Sequence[str]
+    ) -> str:
+        """Reconcile `table` with the payload registered as `df`; return its insert."""
+        declared = RAW_TYPES.get(table, {}) if self.typed else {}
+        created = not self.has_table(table)
+        if created:
+            # Mode texte : types du lot (CSV -> VARCHAR) ; mode typé : types déclarés
+            select = typed_select(columns, declared) if self.typed else "*"
+            self.con.execute(
+                f"CREATE TABLE {table} AS SELECT {select},"
+                " CAST($load_time AS TIMESTAMPTZ) AS load_time FROM df LIMIT 0;",
+                {"load_time": self.load_time},
+            )
+        if table not in self._indexed:
+            _ensure_pk_index(self.con, table, pk_cols)
+            self._indexed.add(table)
+
+        types = _table_types(self.con, table)
+        # Nouvelles colonnes API : ajoutées (type déclaré en mode typé, sinon texte)
+        for col in (c for c in columns if c not in types):
+            col_type = declared.get(col, "VARCHAR")
+            self.con.execute(f'ALTER TABLE {table} ADD COLUMN "{col}" {col_type};')
+            types[col] = col_type
+
+        # Migration d'une table texte vers le schéma déclaré, puis élargissements
+        # (jamais sur la clé : une ligne à clé non convertible est écartée)
+        retyped = {
+            c: t
+            for c, t in declared.items()
+            if types.get(c) == "VARCHAR" and t != "VARCHAR"
+        }
+        if retyped:
+            values = {c: t for c, t in retyped.items() if c not in pk_cols}
+            retyped.update(_widen(self.con, table, values))
+            key_types = {c: retyped.get(c, types[c]) for c in pk_cols}
+            if _reject_rows(self.con, table, table, key_types, self.load_time):
+                self.con.execute(
+                    f"DELETE FROM {table} WHERE NOT ({_key_fits(key_types)});"
+                )
+        incoming = {c: retyped.get(c, types[c]) for c in columns if c not in pk_cols}
+        retyped.update(_widen(self.con, "df", incoming))
+        if retyped:
+            types.update(retyped)
+            _retype_table(self.con, table, types, pk_cols)
+
+        key_types = {c: types[c] for c in pk_cols}
+        _reject_rows(self.con, "df", table, key_types, self.load_time)
+
+        _record_schema_version(
+            self.con, table, columns, self.load_time, force=created or bool(retyped)
+        )
+        # Doublons (déjà chargés ou répétés dans le lot) ignorés via l'index unique
+        return (
+            f"INSERT OR IGNORE INTO {table} BY NAME SELECT "
+            f"{typed_select(columns, types)}, "
+            "CAST($load_time AS TIMESTAMPTZ) AS load_time "
+            f"FROM df WHERE {_key_fits(key_types)};"
+        )
+
+    def write(
+        self, df: pa.Table | pd.DataFrame, table: str, pk_cols: Sequence[str]
+    ) -> int:
+        """Insert a dataset into a raw table with PK-based deduplication.
+
+        Args:
+            df (pa.Table | pd.DataFrame): Input dataset (Arrow is scanned zero-copy).
+            table (str): Fully qualified table name (e.g. 'raw.obs_hourly').
+            pk_cols (Sequence[str]): Columns used as logical primary key.
+
+        Returns:
+            int: Number of rows actually inserted (duplicates excluded).
+
+        Raises:
+            ValueError: If a PK column is missing in df.
+        """
+        columns = df.column_names if isinstance(df, pa.Table) else list(df.columns)
+        missing = set(pk_cols) - set(columns)
+        if missing:
+            raise ValueError(f"Missing PK columns in DataFrame: {missing}")
+
+        self.con.register("df", df)
+        try:
+            insert = self._prepare(table, pk_cols, columns)
+            (inserted,) = self.con.execute(
+                insert, {"load_time": self.load_time}
+            ).fetchone()
+            return inserted
+        finally:
+            self.con.unregister("df")
+
+
+def write_raw_dedup(
+    df: pa.Table | pd.DataFrame, table: str, pk_cols: Sequence[str], db_path: str
+) -> int:
+    """Insert a dataset into a DuckDB table with PK-based deduplication.
+
+    The table carries a unique index on `pk_cols`; rows whose key already
+    exists are skipped by `INSERT OR IGNORE`, so the cost is an index probe
+    per incoming row instead of an anti-join over the whole table history.
+    Single-write shortcut for `RawWriter`.
+
+    Args:
+        df (pa.Table | pd.DataFrame): Input dataset.
         table (str): Fully qualified table name (e.g. 'raw.obs_hourly').
         pk_cols (Sequence[str]): Columns used as logical primary key.
         db_path (str): DuckDB database path.
 
+    Returns:
+        int: Number of rows actually inserted (0 if every key was already loaded).
+
     Raises:
         ValueError: If a PK column is missing in df.
     """
-    missing = set(pk_cols) - set(df.columns)
-    if missing:
-        raise ValueError(f"Missing PK columns in DataFrame: {missing}")
-
-    df = df.copy()
-    df["load_time"] = pd.Timestamp.now(tz="UTC")
-
-    with _connect(db_path) as con:
-        # Utiliser le DF complet et créer une table vide avec les bons types
-        con.register("df", df)
-        con.execute(f"CREATE TABLE IF NOT EXISTS {table} AS SELECT * FROM df LIMIT 0;")
-        con.unregister("df")
-
-        con.register("df", df)
-        on_clause = " AND ".join([f"t.{c} = df.{c}" for c in pk_cols])
-        con.execute(f"""
-            INSERT INTO {table} BY NAME
-            SELECT * FROM df
-            WHERE NOT EXISTS (
-                SELECT 1 FROM {table} t WHERE {on_clause}
-            );
-        """)
-        con.unregister("df")
+    with RawWriter(db_path) as writer:
+        return writer.write(df, table, pk_cols)
+
+
+def migrate_pk_indexes(db_path: str) -> dict[str, int]:
+    """One-time migration of raw tables loaded before the unique PK indexes.
+
+    Duplicate keys (rows repeated within a single API payload by older runs)
+    are deleted, keeping the first loaded row, then the index is created. Runs
+    in one transaction; tables already indexed are left untouched.
+
+    Args:
+        db_path (str): DuckDB database path.
+
+    Returns:
+        dict[str, int]: Rows deleted per migrated table.
+    """
+    removed: dict[str, int] = {}
+    with RawWriter(db_path) as writer:
+        con = writer.con
+        for table, pk_cols in RAW_PRIMARY_KEYS.items():
+            if not writer.has_table(table) or _has_pk_index(con, table):
+                continue
+            pk = ", ".join(pk_cols)
+            (removed[table],) = con.execute(f"""
+                DELETE FROM {table}
+                WHERE rowid NOT IN (SELECT min(rowid) FROM {table} GROUP BY {pk});
+            """).fetchone()
+            _ensure_pk_index(con, table, pk_cols)
+            print(f"{table}: {removed[table]:,} duplicate rows deleted, index created")
+    return removed
+
+
+# --------------------------------------------------------------------------- #
+# Ingestion
+# --------------------------------------------------------------------------- #
+def load_fetched(
+    session,
+    frames: dict[str, pa.Table],
+    db_path: str,
+    stations_ttl: timedelta | None = None,
+    landing_root: str | None = None,
+    typed: bool = False,
+) -> dict[str, int]:
+    """Load one run's fetched hourly tables, plus the station list if it changed.
+
+    The station list goes through a conditional-fetch cache stored next to the
+    warehouse: it is only re-downloaded after `stations_ttl`, and only written
+    when its content changed. Everything is written over one connection and one
+    transaction. With `landing_root`, the hourly rows actually inserted by this
+    run are also dropped as typed, Hive-partitioned Parquet once raw.* is
+    committed (nothing is landed when every row was already loaded).
+
+    Args:
+        session (requests.Session): Pooled, rate-limited API session.
+        frames (dict[str, pa.Table]): Hourly tables per département code.
+        db_path (str): DuckDB database path.
+        stations_ttl (timedelta | None): Station list TTL (defaults to 24 h).
+        landing_root (str | None): Parquet landing zone root (disabled if None).
+        typed (bool): Store raw.* with the declared column types (see RawWriter).
+
+    Returns:
+        dict[str, int]: Rows actually inserted per raw table (0 if nothing new).
+    """
+    from scripts.ingestion.fetch_cache import (
+        DEFAULT_STATIONS_TTL,
+        FetchCache,
+        fetch_stations_if_changed,
+    )
+
+    ttl = DEFAULT_STATIONS_TTL if stations_ttl is None else stations_ttl
+    cache = FetchCache.next_to(db_path, ttl)
+    df_st, st_entry = fetch_stations_if_changed(session, cache)
+
+    inserted = {"raw.stations": 0, "raw.obs_hourly": 0}
+    landed = None
+    # Une connexion, une transaction : tout est commité ensemble ou rien
+    with RawWriter(db_path, typed=typed) as writer:
+        # Stations → raw.stations (seulement si la liste a changé, ou table absente)
+        if df_st is None and not writer.has_table("raw.stations"):
+            df_st, st_entry = fetch_stations_if_changed(session, cache, force=True)
+        if df_st is not None:
+            inserted["raw.stations"] = writer.write(
+                df_st, "raw.stations", RAW_PRIMARY_KEYS["raw.stations"]
+            )
+
+        # Observations horaires → raw.obs_hourly (un seul passage, tous départements)
+        if frames:
+            df_hr = pa.concat_tables(frames.values(), promote_options="default")
+            inserted["raw.obs_hourly"] = writer.write(
+                df_hr, "raw.obs_hourly", RAW_PRIMARY_KEYS["raw.obs_hourly"]
+            )
+            # Landing : uniquement les lignes nouvelles (load_time propre au run)
+            if landing_root and inserted["raw.obs_hourly"]:
+                landed = writer.con.execute(
+                    "SELECT * EXCLUDE (load_time) FROM raw.obs_hourly"
+                    " WHERE load_time = $load_time;",
+                    {"load_time": writer.load_time},
+                ).fetch_arrow_table()
+
+    # Le cache n'est mis à jour qu'une fois l'écriture commitée
+    if st_entry:
+        cache.put(st_entry)
+
+    # Landing Parquet : même load_time que raw.*, après le commit
+    if landed is not None:
+        from scripts.ingestion.landing import land_obs_hourly
+
+        land_obs_hourly(landed, landing_root, writer.load_time)
+
+    if df_st is None:
+        print("raw.stations: inchangé (cache)")
+    else:
+        print(
+            f"raw.stations: {len(df_st):,} rows, "
+            f"{inserted['raw.stations']:,} new (dedup)"
+        )
+    print(f"raw.obs_hourly: {inserted['raw.obs_hourly']:,} new rows (dedup)")
+    return inserted
+
+
+def run_ingestion(
+    depts: Sequence[str],
+    db_path: str,
+    max_workers: int | None = None,
+    stations_ttl: timedelta | None = None,
+    landing_root: str | None = None,
+    typed: bool = False,
+) -> dict[str, int]:
+    """Fetch stations + hourly observations for several départements, then load raw.*.
+
+    All départements are fetched concurrently over one pooled, rate-limited
+    session; results are written in a single pass once every fetch is done
+    (see `load_fetched`).
+
+    Args:
+        depts (Sequence[str]): Département codes (already parsed, e.g. ['9', '2A']).
+        db_path (str): DuckDB database path.
+        max_workers (int | None): Concurrent fetches (defaults to DEFAULT_WORKERS).
+        stations_ttl (timedelta | None): Station list TTL (defaults to 24 h).
+        landing_root (str | None): Parquet landing zone root (disabled if None).
+        typed (bool): Store raw.* with the declared column types (see RawWriter).
+
+    Returns:
+        dict[str, int]: Rows actually inserted per raw table.
+
+    Raises:
+        RuntimeError: If some départements failed (the others are still loaded).
+    """
+    from scripts.ingestion.fetch_meteofrance_paquetobs import (
+        DEFAULT_WORKERS,
+        RateLimiter,
+        fetch_hourly_for_depts,
+        open_session_paquetobs,
+    )
+
+    workers = max_workers or DEFAULT_WORKERS
+    session = open_session_paquetobs(limiter=RateLimiter(), pool_maxsize=workers)
+    frames, errors = fetch_hourly_for_depts(session, depts, max_workers=workers)
+    inserted = load_fetched(
+        session,
+        frames,
+        db_path,
+        stations_ttl=stations_ttl,
+        landing_root=landing_root,
+        typed=typed,
+    )
+
+    for code, df in frames.items():
+        print(f"raw.obs_hourly[{code}]: {len(df):,} rows fetched")
+
+    if errors:
+        raise RuntimeError(f"Départements en échec : {', '.join(sorted(errors))}")
+    return inserted
 
 
 # --------------------------------------------------------------------------- #
 # Main CLI
 # --------------------------------------------------------------------------- #
 def main() -> None:
-    """Fetch and load hourly observations for a département into DuckDB."""
+    """Fetch and load hourly observations for one or more départements into DuckDB."""
     load_dotenv()
 
     ap = argparse.ArgumentParser(
         description="Ingest hourly department data -> DuckDB raw.obs_hourly"
     )
+    target = ap.add_mutually_exclusive_group(required=True)
+    target.add_argument("--dept", help="Code département (ex. '09', '75', '2A', '2B').")
+    target.add_argument(
+        "--depts",
+        help="'all' ou liste de codes séparés par des virgules (ex. '09,75,2A').",
+    )
+    target.add_argument(
+        "--migrate-pk",
+        action="store_true",
+        help="Migration unique d'un warehouse antérieur aux index de clé : "
+        "supprime les doublons des tables raw puis crée les index.",
+    )
+    ap.add_argument(
+        "--workers",
+        type=int,
+        default=None,
+        help="Nombre de départements récupérés en parallèle (défaut : 8).",
+    )
     ap.add_argument(
-        "--dept", required=True, help="Code département (ex. '09', '75', '2A', '2B')."
+        "--stations-ttl",
+        type=float,
+        default=24,
+        help="Heures pendant lesquelles la liste des stations n'est pas redemandée "
+        "(0 = GET conditionnel à chaque run).",
     )
     ap.add_argument("--db", default=os.getenv("DUCKDB_PATH", "data/warehouse.duckdb"))
-    args = ap.parse_args()
-
-    # import du fetcher (DRY)
-    from scripts.ingestion.fetch_meteofrance_paquetobs import (
-        open_session_paquetobs,
-        fetch_stations,
-        fetch_hourly_for_dept,
+    ap.add_argument(
+        "--landing",
+        default=None,
+        help="Racine de la zone de landing Parquet (ex. data/landing), désactivée "
+        "par défaut.",
     )
+    ap.add_argument(
+        "--typed",
+        action="store_true",
+        help="Tables raw typées selon le schéma déclaré (DOUBLE, INTEGER, "
+        "TIMESTAMPTZ) au lieu de texte.",
+    )
+    args = ap.parse_args()
 
-    session = open_session_paquetobs()
+    if args.migrate_pk:
+        migrate_pk_indexes(args.db)
+        return
 
-    # Stations → raw.stations
-    df_st = fetch_stations(session)
-    pk_st = ["Id_station"]
-    write_raw_dedup(df_st, "raw.stations", pk_st, args.db)
-    print(f"raw.stations: {len(df_st):,} rows (dedup)")
+    from scripts.ingestion.fetch_meteofrance_paquetobs import parse_depts
 
-    # Observations horaires → raw.obs_hourly
-    df_hr = fetch_hourly_for_dept(session, args.dept)
-    pk_hr = ["validity_time", "geo_id_insee", "reference_time"]
-    write_raw_dedup(df_hr, "raw.obs_hourly", pk_hr, args.db)
-    print(f"raw.obs_hourly[{args.dept}]: {len(df_hr):,} rows (dedup)")
+    depts = parse_depts(args.depts or args.dept)
+    run_ingestion(
+        depts,
+        args.db,
+        max_workers=args.workers,
+        stations_ttl=timedelta(hours=args.stations_ttl),
+        landing_root=args.landing,
+        typed=args.typed,
+    )
 
 
 if __name__ == "__main__":
@@ -0,0 +1,261 @@
+"""
+Serveur local imitant l'API Météo-France DPPaquetObs (tests de charge hors ligne).
+
+Endpoints (même chemin que l'API réelle, préfixe libre) :
+- GET .../liste-stations?format=csv
+- GET .../paquet/horaire?id-departement=<code>&format=csv
+- GET /_stats : compteurs JSON (requêtes, 200, 429, 5xx…)
+
+Les CSV sont synthétiques (`scripts.mock.synthetic`), pour n'importe quel
+département et nombre de stations. Latence, quota (429 + `Retry-After`) et
+erreurs 5xx aléatoires sont configurables, pour mesurer débit, retries et
+concurrence de l'ingestion de façon reproductible.
+
+Usage :
+    python -m scripts.mock.paquetobs_server --port 8765 --stations 40 \\
+        --latency-ms 200 --rate-429 0.05 --rate-5xx 0.02
+
+    METEOFRANCE_BASE_URL=http://127.0.0.1:8765/public/DPPaquetObs/v1 \\
+    METEOFRANCE_TOKEN=local python -m scripts.ingestion.write_duckdb_raw --depts all
+
+Dépendances : bibliothèque standard (+ codes départements du client de fetch)
+"""
+
+from __future__ import annotations
+
+import argparse
+import functools
+import json
+import random
+import threading
+import time
+from collections import Counter, deque
+from datetime import datetime
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+from scripts.ingestion.fetch_meteofrance_paquetobs import ALL_DEPTS, normalize_dept_code
+from scripts.mock.synthetic import hourly_csv, stations_csv
+
+SERVER_ERRORS: tuple[int, ...] = (500, 502, 503, 504)
+
+
+class StubConfig:
+    """Paramètres du serveur (données générées et pannes injectées)."""
+
+    def __init__(
+        self,
+        n_stations: int = 40,
+        hours: int = 24,
+        end: datetime | None = None,
+        seed: int = 0,
+        latency_ms: float = 0.0,
+        jitter_ms: float = 0.0,
+        rate_429: float = 0.0,
+        rate_5xx: float = 0.0,
+        quota_per_minute: int = 0,
+        retry_after: int = 1,
+        require_apikey: bool = True,
+    ):
+        self.n_stations = n_stations
+        self.hours = hours
+        self.end = end
+        self.seed = seed
+        self.latency_ms = latency_ms
+        self.jitter_ms = jitter_ms
+        self.rate_429 = rate_429
+        self.rate_5xx = rate_5xx
+        self.quota_per_minute = quota_per_minute
+        self.retry_after = retry_after
+        self.require_apikey = require_apikey
+
+
+class _QuotaWindow:
+    """Quota sur une fenêtre glissante de 60 s (délai d'attente si dépassé)."""
+
+    def __init__(self, per_minute: int):
+        self.per_minute = per_minute
+        self._hits: deque[float] = deque()
+        self._lock = threading.Lock()
+
+    def wait_time(self) -> float:
+        if self.per_minute <= 0:
+            return 0.0
+        now = time.monotonic()
+        with self._lock:
+            while self._hits and now - self._hits[0] >= 60:
+                self._hits.popleft()
+            if len(self._hits) >= self.per_minute:
+                return 60 - (now - self._hits[0])
+            self._hits.append(now)
+            return 0.0
+
+
+def make_handler(config: StubConfig) -> type[BaseHTTPRequestHandler]:
+    """Construit la classe de handler liée à `config` (compteurs partagés)."""
+    stats: Counter[str] = Counter()
+    stats_lock = threading.Lock()
+    quota = _QuotaWindow(config.quota_per_minute)
+    rng = random.Random(config.seed)
+    rng_lock = threading.Lock()
+
+    def count(key: str) -> None:
+        with stats_lock:
+            stats[key] += 1
+
+    def render_hourly(dept: str) -> str:
+        return hourly_csv(
+            dept, config.n_stations, config.hours, config.end, config.seed
+        )
+
+    # Fenêtre figée (--end) : chaque paquet est généré une seule fois
+    if config.end is not None:
+        render_hourly = functools.lru_cache(maxsize=None)(render_hourly)
+
+    class PaquetObsHandler(BaseHTTPRequestHandler):
+        # Keep-alive (comme l'API réelle) : le pool de connexions client est réutilisé
+        protocol_version = "HTTP/1.1"
+
+        def log_message(self, format: str, *args) -> None:
+            pass  # silencieux : les compteurs /_stats suffisent
+
+        def _send(self, status: int, body: str, content_type: str, **headers) -> None:
+            payload = body.encode("utf-8")
+            self.send_response(status)
+            self.send_header("Content-Type", content_type)
+            self.send_header("Content-Length", str(len(payload)))
+            for name, value in headers.items():
+                self.send_header(name.replace("_", "-"), str(value))
+            self.end_headers()
+            self.wfile.write(payload)
+            count(str(status))
+
+        def _error(self, status: int, message: str, **headers) -> None:
+            body = json.dumps({"code": status, "message": message})
+            self._send(status, body, "application/json", **headers)
+
+        def do_GET(self) -> None:
+            url = urlparse(self.path)
+            if url.path == "/_stats":
+                with stats_lock:
+                    body = json.dumps(dict(stats))
+                self._send(200, body, "application/json")
+                return
+
+            count("requests")
+            if config.require_apikey and not self.headers.get("apikey"):
+                self._error(401, "Invalid Credentials")
+                return
+
+            # Quota emulé (fenêtre de 60 s), puis pannes aléatoires
+            wait = quota.wait_time()
+            with rng_lock:
+                draw = rng.random()
+                delay = config.latency_ms + rng.uniform(0, config.jitter_ms)
+            if wait > 0:
+                self._error(429, "Quota exceeded", Retry_After=max(1, round(wait)))
+                return
+            if draw < config.rate_429:
+                self._error(429, "Too Many Requests", Retry_After=config.retry_after)
+                return
+            if draw < config.rate_429 + config.rate_5xx:
+                status = SERVER_ERRORS[int(draw * 1e6) % len(SERVER_ERRORS)]
+                self._error(status, "Injected server error")
+                return
+
+            if delay > 0:
+                time.sleep(delay / 1000)
+
+            params = {k: v[-1] for k, v in parse_qs(url.query).items()}
+            if url.path.endswith("/liste-stations"):
+                body = stations_csv(ALL_DEPTS, config.n_stations, config.seed)
+            elif url.path.endswith("/paquet/horaire"):
+                dept = normalize_dept_code(params.get("id-departement", ""))
+                if dept not in ALL_DEPTS:
+                    self._error(400, f"Unknown id-departement: {dept!r}")
+                    return
+                body = render_hourly(dept)
+            else:
+                self._error(404, "Not Found")
+                return
+            self._send(200, body, "text/csv; charset=utf-8")
+
+    return PaquetObsHandler
+
+
+def serve(
+    config: StubConfig, host: str = "127.0.0.1", port: int = 0
+) -> ThreadingHTTPServer:
+    """Démarre le serveur dans un thread daemon (port 0 = port libre).
+
+    Returns:
+        ThreadingHTTPServer: Serveur démarré ; `server_address` donne le port
+        effectif, `shutdown()` l'arrête.
+    """
+    server = ThreadingHTTPServer((host, port), make_handler(config))
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+def base_url(server: ThreadingHTTPServer) -> str:
+    """URL de base à passer dans `METEOFRANCE_BASE_URL`."""
+    host, port = server.server_address[:2]
+    return f"http://{host}:{port}/public/DPPaquetObs/v1"
+
+
+def main() -> None:
+    """CLI : lance le serveur au premier plan."""
+    ap = argparse.ArgumentParser(description="Serveur local DPPaquetObs (synthétique)")
+    ap.add_argument("--host", default="127.0.0.1")
+    ap.add_argument("--port", type=int, default=8765)
+    ap.add_argument("--stations", type=int, default=40, help="Stations par département")
+    ap.add_argument(
+        "--hours", type=int, default=24, help="Profondeur du paquet horaire"
+    )
+    ap.add_argument(
+        "--end",
+        type=datetime.fromisoformat,
+        default=None,
+        help="Dernière heure servie (ISO 8601, ex. 2025-01-15T12:00+00:00) ; "
+        "défaut : heure courante (fenêtre glissante).",
+    )
+    ap.add_argument("--seed", type=int, default=0)
+    ap.add_argument("--latency-ms", type=float, default=0.0)
+    ap.add_argument("--jitter-ms", type=float, default=0.0)
+    ap.add_argument("--rate-429", type=float, default=0.0, help="Part de 429 (0-1)")
+    ap.add_argument("--rate-5xx", type=float, default=0.0, help="Part de 5xx (0-1)")
+    ap.add_argument(
+        "--quota-per-minute",
+        type=int,
+        default=0,
+        help="Quota émulé (429 + Retry-After au-delà) ; 0 = désactivé.",
+    )
+    ap.add_argument("--retry-after", type=int, default=1)
+    args = ap.parse_args()
+
+    config = StubConfig(
+        n_stations=args.stations,
+        hours=args.hours,
+        end=args.end,
+        seed=args.seed,
+        latency_ms=args.latency_ms,
+        jitter_ms=args.jitter_ms,
+        rate_429=args.rate_429,
+        rate_5xx=args.rate_5xx,
+        quota_per_minute=args.quota_per_minute,
+        retry_after=args.retry_after,
+    )
+    server = ThreadingHTTPServer((args.host, args.port), make_handler(config))
+    server.daemon_threads = True
+    print(f"DPPaquetObs local : {base_url(server)}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+
+
+if __name__ == "__main__":
+    main()
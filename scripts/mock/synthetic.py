@@ -0,0 +1,252 @@
+"""
+Générateur de données synthétiques au format DPPaquetObs (CSV `;`).
+
+Les valeurs sont déterministes : une même (graine, station, heure) produit
+toujours la même ligne, comme l'API réelle qui renvoie la même observation
+d'un fetch à l'autre sur sa fenêtre glissante de 24 h. Les ordres de grandeur
+(cycle diurne, gradient d'altitude, capteurs absents selon les stations)
+restent dans les plages testées par `stg_obs_hourly`.
+
+Utilisé par le serveur local (`scripts.mock.paquetobs_server`) et les benchmarks.
+"""
+
+from __future__ import annotations
+
+import math
+import random
+from collections.abc import Iterable, Iterator
+from datetime import UTC, datetime, timedelta
+
+# Colonnes et ordre des CSV renvoyés par l'API
+STATION_COLUMNS: tuple[str, ...] = (
+    "Id_station",
+    "Id_omm",
+    "Nom_usuel",
+    "Latitude",
+    "Longitude",
+    "Altitude",
+    "Date_ouverture",
+    "Pack",
+)
+
+HOURLY_COLUMNS: tuple[str, ...] = (
+    "lat",
+    "lon",
+    "geo_id_insee",
+    "reference_time",
+    "insert_time",
+    "validity_time",
+    "t",
+    "td",
+    "tx",
+    "tn",
+    "u",
+    "ux",
+    "un",
+    "dd",
+    "ff",
+    "dxy",
+    "fxy",
+    "dxi",
+    "fxi",
+    "rr1",
+    "t_10",
+    "t_20",
+    "t_50",
+    "t_100",
+    "vv",
+    "etat_sol",
+    "sss",
+    "n",
+    "insolh",
+    "ray_glo01",
+    "pres",
+    "pmer",
+)
+
+# Emprise approximative des départements d'outre-mer (lat, lon)
+_OVERSEAS_ORIGINS: dict[str, tuple[float, float]] = {
+    "971": (16.2, -61.6),
+    "972": (14.6, -61.0),
+    "973": (4.0, -53.0),
+    "974": (-21.1, 55.5),
+    "975": (46.9, -56.3),
+    "976": (-12.8, 45.1),
+}
+
+ISO_FORMAT = "%Y-%m-%dT%H:%M:%SZ"
+
+
+# --------------------------------------------------------------------------- #
+# Stations
+# --------------------------------------------------------------------------- #
+
+
+def station_id(dept: str, index: int) -> str:
+    """Identifiant INSEE `ddnnnpp` (commune sur 5 caractères + poste sur 3).
+
+    Corse : préfixe '20' (communes 001-499 pour 2A, 500-998 pour 2B) ;
+    outre-mer : code à 3 chiffres + commune sur 2.
+    """
+    code = dept.upper()
+    offset = 0
+    if code in ("2A", "2B"):
+        prefix, width, capacity = "20", 3, 499
+        offset = 0 if code == "2A" else 499
+    elif len(code) == 3:
+        prefix, width, capacity = code, 2, 99
+    else:
+        prefix, width, capacity = f"{int(code):02d}", 3, 999
+    commune, post = offset + index % capacity + 1, index // capacity + 1
+    return f"{prefix}{commune:0{width}d}{post:03d}"
+
+
+def _station_meta(dept: str, index: int, seed: int) -> tuple[str, float, float, int]:
+    """(id, latitude, longitude, altitude) d'une station, stables pour une graine."""
+    sid = station_id(dept, index)
+    origin = _OVERSEAS_ORIGINS.get(dept.upper())
+    if origin is None:
+        rng_dept = random.Random(f"dept:{seed}:{dept}")
+        origin = (rng_dept.uniform(42.5, 50.5), rng_dept.uniform(-4.5, 7.5))
+    rng = random.Random(f"station:{seed}:{sid}")
+    lat = origin[0] + rng.uniform(-0.4, 0.4)
+    lon = origin[1] + rng.uniform(-0.5, 0.5)
+    altitude = int(rng.triangular(0, 1600, 150))
+    return sid, lat, lon, altitude
+
+
+def iter_stations(
+    depts: Iterable[str], n_stations: int, seed: int = 0
+) -> Iterator[list[str]]:
+    """Lignes (valeurs texte) de la liste des stations pour `depts`."""
+    for dept in depts:
+        for i in range(n_stations):
+            sid, lat, lon, alt = _station_meta(dept, i, seed)
+            yield [
+                sid,
+                "" if i % 5 else f"07{random.Random(sid).randint(0, 999):03d}",
+                f"STATION {dept}-{i + 1:03d}",
+                f"{lat:.4f}",
+                f"{lon:.4f}",
+                str(alt),
+                f"{1950 + i % 70}-01-01",
+                "RADOME" if i % 3 else "ETENDU",
+            ]
+
+
+# --------------------------------------------------------------------------- #
+# Observations horaires
+# --------------------------------------------------------------------------- #
+
+
+def _fmt(value: float | None, digits: int = 1) -> str:
+    return "" if value is None else f"{value:.{digits}f}"
+
+
+def _observation(
+    sid: str, lat: float, lon: float, alt: int, ts: datetime, index: int, seed: int
+) -> list[str]:
+    """Une ligne d'observation horaire (valeurs physiquement plausibles)."""
+    rng = random.Random(f"obs:{seed}:{sid}:{ts:%Y%m%d%H}")
+    # Cycle diurne (max vers 15 h) et saisonnier (max fin juillet)
+    diurnal = math.sin(2 * math.pi * (ts.hour - 9) / 24)
+    seasonal = math.cos(2 * math.pi * (ts.timetuple().tm_yday - 200) / 365)
+    sun = max(0.0, diurnal)
+
+    t = 285.0 + 9 * seasonal + 5 * diurnal - 0.0065 * alt - 0.5 * (lat - 46)
+    t += rng.gauss(0, 1.2)
+    td = t - rng.uniform(0.5, 9)
+    u = max(5, min(100, round(100 - 5 * (t - td))))
+    ff = rng.gammavariate(2, 1.6)
+    fxi = ff * rng.uniform(1.3, 2.2)
+    raining = rng.random() < 0.12
+    rr1 = round(rng.expovariate(0.8), 1) if raining else 0.0
+    pmer = 101325 + rng.gauss(0, 900)
+
+    # Capteurs présents selon le type de station (index) : champs vides sinon
+    extended = index % 3 == 0
+    soil = index % 4 == 0
+    return [
+        f"{lat:.4f}",
+        f"{lon:.4f}",
+        sid,
+        ts.strftime(ISO_FORMAT),
+        (ts + timedelta(minutes=rng.randint(5, 40))).strftime(ISO_FORMAT),
+        ts.strftime(ISO_FORMAT),
+        _fmt(t, 2),
+        _fmt(td, 2),
+        _fmt(t + rng.uniform(0, 1.5), 2),
+        _fmt(t - rng.uniform(0, 1.5), 2),
+        str(u),
+        str(min(100, u + rng.randint(0, 6))),
+        str(max(0, u - rng.randint(0, 6))),
+        str(rng.randrange(0, 361, 10)),
+        _fmt(ff),
+        str(rng.randrange(0, 361, 10)) if extended else "",
+        _fmt(ff * 1.2) if extended else "",
+        str(rng.randrange(0, 361, 10)),
+        _fmt(fxi),
+        _fmt(rr1),
+        _fmt(t - 1.5 if soil else None, 2),
+        _fmt(t - 2.5 if soil else None, 2),
+        _fmt(284 + 3 * seasonal if soil else None, 2),
+        _fmt(285 + seasonal if soil else None, 2),
+        str(rng.randint(2000, 50000) if not raining else rng.randint(200, 8000)),
+        str(rng.randint(0, 9)) if soil else "",
+        _fmt(max(0.0, -0.02 * (t - 273.15)) if alt > 800 else 0.0, 2),
+        str(rng.randint(0, 8)) if extended else "",
+        str(round(60 * sun * rng.random())) if extended else "",
+        str(round(3.2e6 * sun * rng.uniform(0.3, 1))) if extended else "",
+        _fmt(pmer * math.exp(-alt / 8400), 0),
+        _fmt(pmer, 0),
+    ]
+
+
+def iter_hourly(
+    dept: str,
+    n_stations: int,
+    hours: int = 24,
+    end: datetime | None = None,
+    seed: int = 0,
+) -> Iterator[list[str]]:
+    """Lignes horaires d'un département : `hours` heures jusqu'à `end` inclus.
+
+    Args:
+        dept (str): Code département ('9', '2A', '974'…).
+        n_stations (int): Nombre de stations du département.
+        hours (int): Profondeur de la fenêtre (24 h pour l'API réelle).
+        end (datetime | None): Dernière heure (défaut : heure UTC courante).
+        seed (int): Graine de génération.
+    """
+    if end is None:
+        end = datetime.now(UTC)
+    end = end.astimezone(UTC).replace(minute=0, second=0, microsecond=0)
+    stations = [_station_meta(dept, i, seed) for i in range(n_stations)]
+    for h in range(hours - 1, -1, -1):
+        ts = end - timedelta(hours=h)
+        for i, (sid, lat, lon, alt) in enumerate(stations):
+            yield _observation(sid, lat, lon, alt, ts, i, seed)
+
+
+def to_csv(columns: Iterable[str], rows: Iterable[list[str]]) -> Iterator[str]:
+    """Sérialise en CSV `;` ligne par ligne (en-tête compris)."""
+    yield ";".join(columns) + "\n"
+    for row in rows:
+        yield ";".join(row) + "\n"
+
+
+def stations_csv(depts: Iterable[str], n_stations: int, seed: int = 0) -> str:
+    """CSV complet de `/liste-stations`."""
+    return "".join(to_csv(STATION_COLUMNS, iter_stations(depts, n_stations, seed)))
+
+
+def hourly_csv(
+    dept: str,
+    n_stations: int,
+    hours: int = 24,
+    end: datetime | None = None,
+    seed: int = 0,
+) -> str:
+    """CSV complet de `/paquet/horaire` pour un département."""
+    rows = iter_hourly(dept, n_stations, hours, end, seed)
+    return "".join(to_csv(HOURLY_COLUMNS, rows))
@@ -0,0 +1,287 @@
+"""Publication des marts servis au dashboard sous forme de snapshot Arrow.
+
+Le dashboard ne lit plus le fichier DuckDB (verrouillé par `dbt build` et
+l'ingestion) : en fin de pipeline, les marts servis sont exportés dans un
+répertoire versionné, puis un pointeur est basculé de façon atomique :
+
+    <root>/<version>/<schema>.<table>.arrow   (Arrow IPC non compressé)
+    <root>/<version>/<schema>.<table>/dept_code=XX/part-0.arrow
+    <root>/<version>/series/month=YYYY-MM/part-0.parquet
+    <root>/<version>/manifest.json
+    <root>/CURRENT                            (nom de la version courante)
+
+Les fichiers Arrow IPC non compressés se lisent par memory-map, sans copie.
+Les tables déclarées dans `PARTITION_COLUMNS` sont éclatées par département
+(partitionnement Hive) : le dashboard ne lit que les fichiers de la zone
+affichée.
+L'historique horaire (`fct_obs_hourly`, drilldown par station) est exporté en
+Parquet par mois, trié par (station_id, validity_time_utc) en petits row
+groups : les statistiques min/max de station_id font de la lecture d'une
+station un accès ponctuel. Seuls les mois touchés depuis la version précédente
+(`loaded_at_utc` au-delà du filigrane du manifest) sont réécrits ; les autres
+sont repris par lien physique.
+Un lecteur suit `CURRENT` : il voit l'ancienne ou la nouvelle version, jamais
+un snapshot partiel. Les anciennes versions sont purgées (les `keep` plus
+récentes sont conservées ; un lecteur qui les a déjà mappées n'est pas gêné).
+
+Usage :
+    python -m scripts.serving.publish_snapshot [--db data/warehouse.duckdb] \\
+        [--root data/serving] [--keep 3]
+"""
+
+from __future__ import annotations
+
+import argparse
+import json
+import os
+import shutil
+import uuid
+from datetime import UTC, datetime
+from pathlib import Path
+
+import duckdb
+import pyarrow as pa
+import pyarrow.dataset as ds
+
+DEFAULT_DB_PATH: str = os.getenv("DUCKDB_PATH", "data/warehouse.duckdb")
+DEFAULT_SERVING_ROOT: str = os.getenv("SERVING_PATH", "data/serving")
+
+# Marts lus par le dashboard (apps/bi-streamlit/data.py)
+SERVING_TABLES: tuple[str, ...] = (
+    "marts.agg_station_latest_24h",
+    "marts.dim_station_grid",
+    "marts.dim_departments",
+)
+
+# Tables partitionnées par zone (colonne de partition Hive, triée à l'export)
+PARTITION_COLUMNS: dict[str, str] = {
+    "marts.agg_station_latest_24h": "dept_code",
+    "marts.dim_station_grid": "dept_code",
+}
+
+# Historique servi au drilldown station : colonnes exportées, tri, row groups
+SERIES_SOURCE = "marts.fct_obs_hourly"
+SERIES_DIR = "series"
+SERIES_COLUMNS: tuple[str, ...] = (
+    "station_id",
+    "validity_time_utc",
+    "temperature_c",
+    "temp_24h_c",
+    "precip_mm_h",
+    "precip_24h_mm",
+    "snow_depth_m",
+    "wind_speed_kmh",
+    "wind_sector",
+    "humidity_pct",
+)
+SERIES_ROW_GROUP_SIZE = 8192
+
+CURRENT_POINTER = "CURRENT"
+MANIFEST = "manifest.json"
+
+
+def current_version(root: str) -> str | None:
+    """Nom de la version publiée (contenu de `CURRENT`), ou None."""
+    try:
+        return (Path(root) / CURRENT_POINTER).read_text().strip() or None
+    except FileNotFoundError:
+        return None
+
+
+def _write_arrow(table: pa.Table, path: Path) -> None:
+    """Écrit `table` en Arrow IPC (format fichier, non compressé : memory-map)."""
+    with (
+        pa.OSFile(str(path), "wb") as sink,
+        pa.ipc.new_file(sink, table.schema) as writer,
+    ):
+        writer.write_table(table)
+
+
+def _write_partitioned(table: pa.Table, path: Path, column: str) -> None:
+    """Écrit `table` en Arrow IPC partitionné Hive sur `column` (texte)."""
+    ds.write_dataset(
+        table,
+        str(path),
+        format="ipc",
+        partitioning=ds.partitioning(pa.schema([(column, pa.string())]), flavor="hive"),
+        basename_template="part-{i}.arrow",
+    )
+
+
+def _month_file(root: Path, month: str) -> Path:
+    return root / SERIES_DIR / f"month={month}" / "part-0.parquet"
+
+
+def _publish_series(
+    con: duckdb.DuckDBPyConnection, staging: Path, previous: Path | None
+) -> dict:
+    """Exporte l'historique horaire par mois dans `staging/series`.
+
+    Les mois sans ligne (re)chargée depuis le filigrane de la version
+    `previous` sont repris par lien physique (copie si impossible) ; les autres
+    sont réécrits triés par (station_id, validity_time_utc).
+
+    Returns:
+        dict: Entrée du manifest (filigrane, mois exportés et réécrits).
+    """
+    watermark = None
+    if previous is not None and (previous / SERIES_DIR).is_dir():
+        try:
+            manifest = json.loads((previous / MANIFEST).read_text())
+            watermark = manifest.get(SERIES_DIR, {}).get("loaded_at_utc")
+        except (FileNotFoundError, json.JSONDecodeError):
+            watermark = None
+
+    month_sql = "strftime(validity_time_utc, '%Y-%m')"
+    months = [
+        m
+        for (m,) in con.execute(
+            f"SELECT DISTINCT {month_sql} FROM {SERIES_SOURCE} ORDER BY 1"
+        ).fetchall()
+    ]
+    if watermark is None:
+        touched = set(months)
+    else:
+        touched = {
+            m
+            for (m,) in con.execute(
+                f"SELECT DISTINCT {month_sql} FROM {SERIES_SOURCE} "
+                "WHERE loaded_at_utc > $watermark::TIMESTAMPTZ",
+                {"watermark": watermark},
+            ).fetchall()
+        }
+
+    columns = ", ".join(SERIES_COLUMNS)
+    rewritten = []
+    for month in months:
+        target = _month_file(staging, month)
+        target.parent.mkdir(parents=True)
+        source = _month_file(previous, month) if previous is not None else None
+        if month not in touched and source is not None and source.exists():
+            try:
+                os.link(source, target)
+            except OSError:
+                shutil.copy2(source, target)
+            continue
+        con.execute(
+            f"""
+            COPY (
+                SELECT {columns} FROM {SERIES_SOURCE}
+                WHERE validity_time_utc >= $start::TIMESTAMPTZ
+                  AND validity_time_utc < $start::TIMESTAMPTZ + INTERVAL 1 MONTH
+                ORDER BY station_id, validity_time_utc
+            ) TO '{target}'
+            (FORMAT parquet, COMPRESSION zstd, ROW_GROUP_SIZE {SERIES_ROW_GROUP_SIZE})
+            """,
+            {"start": f"{month}-01 00:00:00+00"},
+        )
+        rewritten.append(month)
+
+    (loaded_at,) = con.execute(
+        f"SELECT max(loaded_at_utc) FROM {SERIES_SOURCE}"
+    ).fetchone()
+    return {
+        "loaded_at_utc": loaded_at.isoformat() if loaded_at else watermark,
+        "months": months,
+        "rewritten": rewritten,
+    }
+
+
+def _swap_pointer(root: Path, version: str) -> None:
+    """Bascule `CURRENT` vers `version` (écriture temporaire + rename atomique)."""
+    tmp = root / f".{CURRENT_POINTER}.{uuid.uuid4().hex}.tmp"
+    tmp.write_text(version + "\n")
+    os.replace(tmp, root / CURRENT_POINTER)
+
+
+def prune_versions(root: str, keep: int) -> list[str]:
+    """Supprime les versions les plus anciennes au-delà des `keep` plus récentes.
+
+    La version courante n'est jamais supprimée.
+
+    Returns:
+        list[str]: Versions supprimées.
+    """
+    base = Path(root)
+    current = current_version(root)
+    versions = sorted(
+        p.name for p in base.iterdir() if p.is_dir() and not p.name.startswith(".")
+    )
+    removed = [v for v in versions[: max(0, len(versions) - keep)] if v != current]
+    for version in removed:
+        shutil.rmtree(base / version, ignore_errors=True)
+    return removed
+
+
+def publish_snapshot(
+    db_path: str,
+    root: str,
+    tables: tuple[str, ...] = SERVING_TABLES,
+) -> str:
+    """Exporte `tables` et l'historique horaire dans une version, puis la publie.
+
+    La lecture se fait en `read_only` et en un seul passage par table ; la
+    version est écrite dans un répertoire temporaire renommé une fois complet,
+    avant la bascule du pointeur.
+
+    Args:
+        db_path (str): Fichier DuckDB du warehouse.
+        root (str): Racine des snapshots servis.
+        tables (tuple[str, ...]): Tables `schema.table` à exporter.
+
+    Returns:
+        str: Nom de la version publiée (horodatage UTC).
+    """
+    base = Path(root)
+    base.mkdir(parents=True, exist_ok=True)
+    previous = current_version(root)
+    now = datetime.now(UTC)
+    version = now.strftime("%Y%m%dT%H%M%S%fZ")
+    staging = base / f".{version}.tmp"
+    staging.mkdir()
+
+    manifest = {"version": version, "created_at": now.isoformat(), "tables": {}}
+    try:
+        with duckdb.connect(db_path, read_only=True) as con:
+            con.execute("SET TimeZone = 'UTC';")
+            for name in tables:
+                column = PARTITION_COLUMNS.get(name)
+                order = f" ORDER BY {column}" if column else ""
+                table = con.execute(f"SELECT * FROM {name}{order}").fetch_arrow_table()
+                if column:
+                    _write_partitioned(table, staging / name, column)
+                else:
+                    _write_arrow(table, staging / f"{name}.arrow")
+                manifest["tables"][name] = {"rows": table.num_rows, "partition": column}
+            manifest[SERIES_DIR] = _publish_series(
+                con, staging, base / previous if previous else None
+            )
+        (staging / MANIFEST).write_text(json.dumps(manifest, indent=2) + "\n")
+        staging.rename(base / version)
+    except BaseException:
+        shutil.rmtree(staging, ignore_errors=True)
+        raise
+
+    _swap_pointer(base, version)
+    return version
+
+
+def main() -> None:
+    """CLI : publie les marts servis et purge les anciennes versions."""
+    ap = argparse.ArgumentParser(description="Snapshot Arrow des marts servis")
+    ap.add_argument("--db", default=DEFAULT_DB_PATH)
+    ap.add_argument("--root", default=DEFAULT_SERVING_ROOT)
+    ap.add_argument(
+        "--keep", type=int, default=3, help="Nombre de versions conservées."
+    )
+    args = ap.parse_args()
+
+    version = publish_snapshot(args.db, args.root)
+    removed = prune_versions(args.root, args.keep)
+    print(f"Snapshot publié : {Path(args.root) / version}")
+    if removed:
+        print(f"Versions purgées : {', '.join(removed)}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,13 @@
+-- macros/incremental.sql
+{# Filigrane de chargement d'un modèle incrémental : max(column) de {{ this }}.
+   Si la colonne n'existe pas encore (table créée avant son ajout), renvoie la
+   date plancher : le run suivant retraite tout une fois, sans full-refresh. #}
+{% macro load_watermark(column='loaded_at_utc') -%}
+  {%- set floor = "TIMESTAMPTZ '1900-01-01'" -%}
+  {%- set columns = adapter.get_columns_in_relation(this) | map(attribute='name') | map('lower') | list if execute else [] -%}
+  {%- if column | lower in columns -%}
+    (select coalesce(max({{ column }}), {{ floor }}) from {{ this }})
+  {%- else -%}
+    {{ floor }}
+  {%- endif -%}
+{%- endmacro %}
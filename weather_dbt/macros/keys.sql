@@ -0,0 +1,8 @@
+-- macros/keys.sql
+
+{# Clé entière d'une observation horaire : station_key sur les bits hauts,
+   heure epoch sur les 20 bits bas (2^20 h ≈ 119 ans, jusqu'en 2089).
+   Croissante avec l'heure au sein d'une station (tri et zone maps). #}
+{% macro obs_event_id(station_key, ts) -%}
+  ({{ station_key }} * 1048576 + cast(epoch({{ ts }}) as bigint) // 3600)
+{%- endmacro %}
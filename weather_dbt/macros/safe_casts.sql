@@ -1,3 +1,4 @@
 -- macros/safe_casts.sql
-{% macro safe_double(col) %} try_cast(nullif({{ col }}, '') as double) {% endmacro %}
-{% macro safe_int(col) %}    try_cast(nullif({{ col }}, '') as integer) {% endmacro %}
\ No newline at end of file
+-- try_cast renvoie NULL sur '' : compatible avec raw.* (texte) et la landing Parquet (typée)
+{% macro safe_double(col) %} try_cast({{ col }} as double) {% endmacro %}
+{% macro safe_int(col) %}    try_cast({{ col }} as integer) {% endmacro %}
@@ -18,3 +18,20 @@
     range between interval {{ hours }} hour preceding and current row
   )
 {%- endmacro %}
+
+{# Variantes sur une fenêtre nommée (clause WINDOW) : toutes les agrégations
+   partageant la même partition / le même tri sont calculées en un seul passage trié.
+   window_name: nom déclaré via `window <nom> as (partition by ... order by ...)` #}
+{% macro rolling_sum_over(col_expr, window_name, hours) -%}
+  sum({{ col_expr }}) over (
+    {{ window_name }}
+    range between interval {{ hours }} hour preceding and current row
+  )
+{%- endmacro %}
+
+{% macro rolling_avg_over(col_expr, window_name, hours) -%}
+  avg({{ col_expr }}) over (
+    {{ window_name }}
+    range between interval {{ hours }} hour preceding and current row
+  )
+{%- endmacro %}
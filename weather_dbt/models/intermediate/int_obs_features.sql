@@ -6,30 +6,66 @@
     on_schema_change='sync_all_columns'
 ) }}
 
-with base as (
+{% if is_incremental() %}
+-- Clés (station, heure) reçues depuis le dernier run, y compris les heures en
+-- retard et les corrections (nouveau reference_time) : filigrane sur load_time
+with changed_keys as (
+    select distinct
+        station_id,
+        validity_time_utc
+    from {{ ref('stg_obs_hourly') }}
+    where load_time_utc > {{ load_watermark('loaded_at_utc') }}
+),
+
+{% else %}
+with
+{% endif %}
+
+-- Dernière production connue par (station, heure) ; loaded_at = dernier
+-- chargement touchant la clé, pour que le filigrane avance même si la ligne
+-- reçue est une production plus ancienne
+latest as (
     select
-        {{ dbt_utils.generate_surrogate_key(['obs_hourly.station_id','obs_hourly.validity_time_utc']) }} as event_id,
         obs_hourly.*,
-        {{ kelvin_to_c('obs_hourly.temperature_k') }} as temperature_c
+        max(obs_hourly.load_time_utc) over (
+            partition by obs_hourly.station_id, obs_hourly.validity_time_utc
+        ) as loaded_at_utc
     from {{ ref('stg_obs_hourly') }} as obs_hourly
     {% if is_incremental() %}
-    -- On n’ingère que les nouvelles heures
-        where obs_hourly.validity_time_utc > (
-            select coalesce(max(validity_time_utc), '1900-01-01') from {{ this }}
-        )
+    inner join changed_keys
+        on obs_hourly.station_id = changed_keys.station_id
+        and obs_hourly.validity_time_utc = changed_keys.validity_time_utc
+    where obs_hourly.validity_time_utc >= (select min(validity_time_utc) from changed_keys)
     {% endif %}
+    qualify row_number() over (
+        partition by obs_hourly.station_id, obs_hourly.validity_time_utc
+        order by obs_hourly.production_time_utc desc
+    ) = 1
+),
+
+base as (
+    select
+        {{ obs_event_id('station_keys.station_key', 'latest.validity_time_utc') }} as event_id,
+        latest.*,
+        {{ kelvin_to_c('latest.temperature_k') }} as temperature_c
+    from latest
+    inner join {{ ref('int_station_keys') }} as station_keys
+        on latest.station_id = station_keys.station_id
 )
 
 select
     event_id,
     station_id,
+    dept_code,
     validity_time_utc,
+    loaded_at_utc,
 
     -- Vent
     wind_dir_deg,
     wind_speed_ms,
     {{ ms_to_kmh('wind_speed_ms') }} as wind_speed_kmh,
     {{ wind_sector('wind_dir_deg') }} as wind_sector,
+    wind_gust_abs_max_ms,
 
     -- Visibilité
     {{ visibility_category('visibility_m') }} as visibility_cat,
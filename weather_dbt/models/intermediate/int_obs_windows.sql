@@ -6,40 +6,99 @@
     on_schema_change='sync_all_columns'
 ) }}
 
-with src as (
-    select *
-    from {{ ref('int_obs_features') }}
-    {% if is_incremental() %}
-    -- Recalcule un buffer de 24h
-        where validity_time_utc >= (
-            select
-                coalesce(
-                    date_add(max(validity_time_utc), INTERVAL '-25 hours'),
-                    TIMESTAMP '1900-01-01'
-                )
-            from {{ this }}
-        )
-    {% endif %}
+with features as (
+    select * from {{ ref('int_obs_features') }}
+),
+
+{% if is_incremental() %}
+-- Clés (re)chargées depuis le dernier run (heures nouvelles, en retard ou corrigées)
+changed_keys as (
+    select
+        station_id,
+        validity_time_utc
+    from features
+    where loaded_at_utc > {{ load_watermark('loaded_at_utc') }}
+),
+
+-- Une heure modifiée change les fenêtres des 24h qui la suivent : on relit ces
+-- heures plus 24h de contexte avant, autour des seules clés modifiées
+src as (
+    select
+        features.*,
+        exists (
+            select 1
+            from changed_keys
+            where
+                changed_keys.station_id = features.station_id
+                and features.validity_time_utc between changed_keys.validity_time_utc
+                and date_add(changed_keys.validity_time_utc, INTERVAL '24 hours')
+        ) as is_affected
+    from features
+    where exists (
+        select 1
+        from changed_keys
+        where
+            changed_keys.station_id = features.station_id
+            and features.validity_time_utc
+            between date_add(changed_keys.validity_time_utc, INTERVAL '-24 hours')
+            and date_add(changed_keys.validity_time_utc, INTERVAL '24 hours')
+    )
+),
+{% else %}
+src as (
+    select
+        *,
+        true as is_affected
+    from features
+),
+{% endif %}
+
+-- Un seul passage trié par station : les 9 agrégats partagent la fenêtre `w`
+windowed as (
+    select
+        event_id,
+        station_id,
+        validity_time_utc,
+        is_affected,
+
+        -- Dernier chargement ayant contribué à la fenêtre 24h
+        max(loaded_at_utc) over (
+            w range between interval 24 hour preceding and current row
+        )                                                   as loaded_at_utc,
+
+        -- Précip cumuls
+        {{ rolling_sum_over('precip_mm_h', 'w', 1) }}  as precip_1h_mm,
+        {{ rolling_sum_over('precip_mm_h', 'w', 3) }}  as precip_3h_mm,
+        {{ rolling_sum_over('precip_mm_h', 'w', 24) }} as precip_24h_mm,
+
+        -- Snow cumuls
+        {{ rolling_sum_over('snow_depth_m', 'w', 1) }}  as snow_1h_m,
+        {{ rolling_sum_over('snow_depth_m', 'w', 3) }}  as snow_3h_m,
+        {{ rolling_sum_over('snow_depth_m', 'w', 24) }} as snow_24h_m,
+
+        -- Temp cumuls
+        {{ rolling_avg_over('temperature_c', 'w', 1) }}  as temp_1h_c,
+        {{ rolling_avg_over('temperature_c', 'w', 3) }}  as temp_3h_c,
+        {{ rolling_avg_over('temperature_c', 'w', 24) }} as temp_24h_c
+
+    from src
+    window w as (partition by station_id order by validity_time_utc)
 )
 
+-- Le contexte ne sert qu'au calcul : seules les heures affectées sont écrites
 select
     event_id,
     station_id,
     validity_time_utc,
-
-    -- Précip cumuls
-    {{ rolling_sum_hours('precip_mm_h', 'validity_time_utc', 'station_id', 1) }}  as precip_1h_mm,
-    {{ rolling_sum_hours('precip_mm_h', 'validity_time_utc', 'station_id', 3) }}  as precip_3h_mm,
-    {{ rolling_sum_hours('precip_mm_h', 'validity_time_utc', 'station_id', 24) }} as precip_24h_mm,
-
-    -- Snow cumuls
-    {{ rolling_sum_hours('snow_depth_m', 'validity_time_utc', 'station_id', 1) }}  as snow_1h_m,
-    {{ rolling_sum_hours('snow_depth_m', 'validity_time_utc', 'station_id', 3) }}  as snow_3h_m,
-    {{ rolling_sum_hours('snow_depth_m', 'validity_time_utc', 'station_id', 24) }} as snow_24h_m,
-
-    -- Temp cumuls
-    {{ rolling_avg_hours('temperature_c', 'validity_time_utc', 'station_id', 1) }}  as temp_1h_c,
-    {{ rolling_avg_hours('temperature_c', 'validity_time_utc', 'station_id', 3) }}  as temp_3h_c,
-    {{ rolling_avg_hours('temperature_c', 'validity_time_utc', 'station_id', 24) }} as temp_24h_c
-
-from src
+    loaded_at_utc,
+    precip_1h_mm,
+    precip_3h_mm,
+    precip_24h_mm,
+    snow_1h_m,
+    snow_3h_m,
+    snow_24h_m,
+    temp_1h_c,
+    temp_3h_c,
+    temp_24h_c
+from windowed
+where is_affected
@@ -0,0 +1,33 @@
+-- models/intermediate/int_station_keys.sql
+-- Dictionnaire station_id -> station_key (entier) : les clés attribuées ne
+-- changent jamais, d'où full_refresh=false (un rebuild renumérote sinon les
+-- event_id déjà fusionnés en aval)
+{{ config(
+    materialized='incremental',
+    unique_key='station_id',
+    incremental_strategy='merge',
+    full_refresh=false
+) }}
+
+with new_stations as (
+    select
+        station_id,
+        min(load_time_utc) as first_loaded_at_utc
+    from {{ ref('stg_obs_hourly') }}
+    {% if is_incremental() %}
+    where load_time_utc > {{ load_watermark('first_loaded_at_utc') }}
+        and station_id not in (select station_id from {{ this }})
+    {% endif %}
+    group by station_id
+)
+
+select
+    station_id,
+    {% if is_incremental() %}
+    (select coalesce(max(station_key), 0) from {{ this }})
+    {% else %}
+    0
+    {% endif %}
+    + row_number() over (order by station_id) as station_key,
+    first_loaded_at_utc
+from new_stations
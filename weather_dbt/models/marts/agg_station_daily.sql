@@ -0,0 +1,121 @@
+-- models/marts/agg_station_daily.sql
+
+{{ config(
+    materialized='incremental',
+    unique_key=['station_id', 'obs_date'],
+    incremental_strategy='merge',
+    on_schema_change='append_new_columns'
+) }}
+
+{% if is_incremental() %}
+-- Jours (station, date UTC) touchés par des lignes du fait construites depuis
+-- le dernier run : ils sont recalculés en entier à partir du fait
+with changed_days as (
+    select distinct
+        station_id,
+        cast(timezone('UTC', validity_time_utc) as date) as obs_date
+    from {{ ref('fct_obs_hourly') }}
+    where loaded_at_utc > {{ load_watermark('loaded_at_utc') }}
+),
+
+{% else %}
+with
+{% endif %}
+
+hourly as (
+    select
+        fct.*,
+        cast(timezone('UTC', fct.validity_time_utc) as date) as obs_date
+    from {{ ref('fct_obs_hourly') }} as fct
+    {% if is_incremental() %}
+    inner join changed_days
+        on fct.station_id = changed_days.station_id
+        and cast(timezone('UTC', fct.validity_time_utc) as date) = changed_days.obs_date
+    where fct.validity_time_utc >= (select min(obs_date) from changed_days)::timestamptz - interval 1 day
+    {% endif %}
+),
+
+daily as (
+    select
+        station_id,
+        obs_date,
+        any_value(dept_code) as dept_code,
+        any_value(station_name) as station_name,
+        max(loaded_at_utc) as loaded_at_utc,
+        count(*) as n_hours,
+
+        -- température
+        count(temperature_c) as temp_hours,
+        min(temperature_c) as temp_min_c,
+        max(temperature_c) as temp_max_c,
+        avg(temperature_c) as temp_mean_c,
+        count(freezing_flag) as freezing_hours,
+
+        -- précipitations & neige
+        sum(precip_mm_h) as precip_total_mm,
+        count(precip_flag) as precip_hours,
+        max(snow_depth_m) as snow_depth_max_m,
+
+        -- vent
+        max(wind_speed_kmh) as wind_speed_max_kmh,
+        max(wind_gust_abs_max_ms) as wind_gust_max_ms,
+        max(wind_beaufort) as wind_beaufort_max
+    from hourly
+    group by station_id, obs_date
+),
+
+dim_precip as (
+    select
+        intensity_level,
+        min_mm,
+        max_mm,
+        intensity_label
+    from {{ ref('dim_precip_intensity') }}
+),
+
+-- Première tranche ouverte vers le bas : borne -inf pour la jointure ASOF
+dim_temp as (
+    select
+        intensity_level,
+        coalesce(min_c, '-infinity'::double) as min_c,
+        max_c,
+        intensity_label
+    from {{ ref('dim_temp_intensity') }}
+)
+
+select
+    daily.station_id,
+    daily.dept_code,
+    daily.station_name,
+    daily.obs_date,
+    daily.loaded_at_utc,
+    daily.n_hours,
+    daily.temp_hours,
+    daily.temp_min_c,
+    daily.temp_max_c,
+    daily.temp_mean_c,
+    daily.freezing_hours,
+    daily.freezing_hours > 0 as is_frost_day,
+    daily.precip_total_mm,
+    daily.precip_hours,
+    daily.snow_depth_max_m,
+    daily.wind_speed_max_kmh,
+    daily.wind_gust_max_ms,
+    daily.wind_beaufort_max,
+
+    -- Tranches des dims 24h appliquées au cumul et à la moyenne du jour
+    case when daily.precip_total_mm <= coalesce(dim_precip.max_mm, 'infinity'::double) then dim_precip.intensity_level end as precip_intensity_level,
+    case when daily.precip_total_mm <= coalesce(dim_precip.max_mm, 'infinity'::double) then dim_precip.intensity_label end as precip_intensity_label,
+    case when daily.temp_mean_c < coalesce(dim_temp.max_c, 'infinity'::double) then dim_temp.intensity_level end as temp_intensity_level,
+    case when daily.temp_mean_c < coalesce(dim_temp.max_c, 'infinity'::double) then dim_temp.intensity_label end as temp_intensity_label
+
+from daily
+
+asof left join dim_precip
+    on daily.precip_total_mm > dim_precip.min_mm
+
+asof left join dim_temp
+    on daily.temp_mean_c >= dim_temp.min_c
+{% if not is_incremental() %}
+order by daily.dept_code, daily.station_id, daily.obs_date
+{% endif %}
@@ -1,9 +1,42 @@
-{{ config(materialized='table') }}
+{{ config(
+    materialized='incremental',
+    unique_key='station_id',
+    incremental_strategy='merge',
+    on_schema_change='append_new_columns'
+) }}
 
-with ranked as (
+-- Dernière heure par station parmi les lignes du fait construites depuis le
+-- dernier run ; une heure plus ancienne que l'état courant (arrivée en retard)
+-- ne le remplace pas
+with latest as (
+    select
+        event_id,
+        station_id,
+        validity_time_utc,
+        loaded_at_utc
+    from {{ ref('fct_obs_hourly') }} as new_rows
+    {% if is_incremental() %}
+    where new_rows.loaded_at_utc > {{ load_watermark('loaded_at_utc') }}
+        and not exists (
+            select 1
+            from {{ this }} as current_state
+            where current_state.station_id = new_rows.station_id
+                and current_state.validity_time_utc > new_rows.validity_time_utc
+        )
+    {% endif %}
+    qualify row_number() over (
+        partition by station_id
+        order by validity_time_utc desc
+    ) = 1
+),
+
+-- Drapeaux calculés une fois, pour les seules stations mises à jour
+enriched as (
     select
         f.station_id,
+        f.dept_code,
         f.validity_time_utc,
+        latest.loaded_at_utc,
         f.temp_24h_c,
         f.precip_24h_mm,
         f.snow_24h_m,
@@ -38,21 +71,21 @@ with ranked as (
         coalesce(f.wind_beaufort, -1) in (2, 3) as is_wind_breeze,
         coalesce(f.wind_beaufort, -1) = 4 as is_wind_strong,
         coalesce(f.wind_beaufort, -1) = 5 as is_wind_very_strong,
-        coalesce(f.wind_beaufort, -1) = 1 as is_wind_calm,
-        row_number() over (
-            partition by f.station_id
-            order by f.validity_time_utc desc
-        ) as rn
-    from {{ ref('fct_obs_hourly') }} f
+        coalesce(f.wind_beaufort, -1) = 1 as is_wind_calm
+    from latest
+    join {{ ref('fct_obs_hourly') }} f
+        on f.event_id = latest.event_id
     join {{ ref('dim_stations') }} s on s.station_id = f.station_id
 )
 
 select
     station_id,
+    dept_code,
     station_name,
     latitude,
     longitude,
     validity_time_utc,
+    loaded_at_utc,
     temp_24h_c,
     precip_24h_mm,
     snow_24h_m,
@@ -83,5 +116,7 @@ select
     is_wind_strong,
     is_wind_very_strong,
     is_wind_calm
-from ranked
-where rn = 1
+from enriched
+{% if not is_incremental() %}
+order by dept_code, station_id
+{% endif %}
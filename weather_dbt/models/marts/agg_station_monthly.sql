@@ -0,0 +1,69 @@
+-- models/marts/agg_station_monthly.sql
+
+{{ config(
+    materialized='incremental',
+    unique_key=['station_id', 'obs_month'],
+    incremental_strategy='merge',
+    on_schema_change='append_new_columns'
+) }}
+
+{% if is_incremental() %}
+-- Mois (station, mois UTC) dont au moins un jour a été recalculé depuis le
+-- dernier run : ils sont recalculés en entier à partir des jours
+with changed_months as (
+    select distinct
+        station_id,
+        date_trunc('month', obs_date) as obs_month
+    from {{ ref('agg_station_daily') }}
+    where loaded_at_utc > {{ load_watermark('loaded_at_utc') }}
+),
+
+{% else %}
+with
+{% endif %}
+
+daily as (
+    select
+        agg_daily.*,
+        date_trunc('month', agg_daily.obs_date) as obs_month
+    from {{ ref('agg_station_daily') }} as agg_daily
+    {% if is_incremental() %}
+    inner join changed_months
+        on agg_daily.station_id = changed_months.station_id
+        and date_trunc('month', agg_daily.obs_date) = changed_months.obs_month
+    where agg_daily.obs_date >= (select min(obs_month) from changed_months)
+    {% endif %}
+)
+
+select
+    station_id,
+    any_value(dept_code) as dept_code,
+    any_value(station_name) as station_name,
+    cast(obs_month as date) as obs_month,
+    max(loaded_at_utc) as loaded_at_utc,
+    count(*) as n_days,
+    cast(sum(n_hours) as bigint) as n_hours,
+
+    -- température (moyenne pondérée par les heures mesurées)
+    min(temp_min_c) as temp_min_c,
+    max(temp_max_c) as temp_max_c,
+    sum(temp_mean_c * temp_hours) / nullif(sum(temp_hours), 0) as temp_mean_c,
+    count(*) filter (where is_frost_day) as frost_days,
+
+    -- précipitations & neige
+    sum(precip_total_mm) as precip_total_mm,
+    max(precip_total_mm) as precip_day_max_mm,
+    count(*) filter (where precip_hours > 0) as precip_days,
+    max(precip_intensity_level) as precip_intensity_level_max,
+    count(*) filter (where snow_depth_max_m > 0) as snow_days,
+    max(snow_depth_max_m) as snow_depth_max_m,
+
+    -- vent
+    max(wind_speed_max_kmh) as wind_speed_max_kmh,
+    max(wind_gust_max_ms) as wind_gust_max_ms,
+    max(wind_beaufort_max) as wind_beaufort_max
+from daily
+group by station_id, obs_month
+{% if not is_incremental() %}
+order by dept_code, station_id, obs_month
+{% endif %}
@@ -0,0 +1,9 @@
+{{ config(materialized='table') }}
+
+select
+    dept_code,
+    dept_name,
+    region_code,
+    region_name
+from {{ ref('departments') }}
+order by dept_code
@@ -0,0 +1,50 @@
+-- models/marts/dim_station_grid.sql
+-- Index de grille des stations par niveau de zoom de la carte : cellules de
+-- 64 px en projection Web Mercator (tuiles de 256 px au zoom z+2). Deux
+-- stations de même cellule se recouvrent à l'écran : le dashboard les
+-- regroupe en un cluster. Le département (celui de la dernière observation)
+-- sert de partition au snapshot servi : l'app ne lit que la grille de sa zone.
+{{ config(materialized='table') }}
+
+{% set min_zoom, max_zoom = 4, 12 %}
+
+with stations as (
+    select
+        s.station_id,
+        latest.dept_code,
+        s.station_name,
+        s.latitude,
+        s.longitude
+    from {{ ref('dim_stations') }} as s
+    join {{ ref('agg_station_latest_24h') }} as latest
+        on latest.station_id = s.station_id
+    where s.latitude between -85 and 85
+        and s.longitude between -180 and 180
+),
+
+-- Coordonnées Web Mercator normalisées dans [0, 1)
+mercator as (
+    select
+        *,
+        (longitude + 180) / 360 as merc_x,
+        (1 - ln(tan(radians(latitude)) + 1 / cos(radians(latitude))) / pi()) / 2 as merc_y
+    from stations
+),
+
+zoom_levels as (
+    select cast(zoom_level as integer) as zoom_level
+    from range({{ min_zoom }}, {{ max_zoom }} + 1) as z(zoom_level)
+)
+
+select
+    mercator.station_id,
+    mercator.dept_code,
+    zoom_levels.zoom_level,
+    cast(floor(mercator.merc_x * pow(2, zoom_levels.zoom_level + 2)) as integer) as cell_x,
+    cast(floor(mercator.merc_y * pow(2, zoom_levels.zoom_level + 2)) as integer) as cell_y,
+    mercator.station_name,
+    mercator.latitude,
+    mercator.longitude
+from mercator
+cross join zoom_levels
+order by mercator.dept_code, zoom_levels.zoom_level, cell_x, cell_y
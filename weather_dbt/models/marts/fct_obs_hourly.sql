@@ -1,15 +1,28 @@
 -- models/marts/fct_obs_hourly.sql
 
-{{ config(materialized='table') }}
+{{ config(
+    materialized='incremental',
+    unique_key='event_id',
+    incremental_strategy='merge',
+    on_schema_change='append_new_columns'
+) }}
 
 with obs_windows as (
     select *
     from {{ ref('int_obs_windows') }}
+    {% if is_incremental() %}
+    -- Heures réécrites par int_obs_windows depuis le dernier run (nouvelles,
+    -- en retard, corrigées, ou dont la fenêtre 24h contient une telle heure)
+    where loaded_at_utc > {{ load_watermark('loaded_at_utc') }}
+    {% endif %}
 ),
 
 obs_features as (
     select *
     from {{ ref('int_obs_features') }}
+    {% if is_incremental() %}
+    where event_id in (select event_id from obs_windows)
+    {% endif %}
 ),
 
 dim_stations as (
@@ -46,10 +59,11 @@ dim_snow as (
     from {{ ref('dim_snow_intensity') }}
 ),
 
+-- Première tranche ouverte vers le bas : borne -inf pour la jointure ASOF
 dim_temp as (
     select
         intensity_level,
-        min_c,
+        coalesce(min_c, '-infinity'::double) as min_c,
         max_c,
         intensity_label
     from {{ ref('dim_temp_intensity') }}
@@ -59,7 +73,9 @@ select
     -- clés
     obs_windows.event_id,
     obs_windows.station_id,
+    obs_features.dept_code,
     obs_windows.validity_time_utc,
+    obs_windows.loaded_at_utc,
 
     -- station
     dim_stations.station_name,
@@ -80,6 +96,7 @@ select
     obs_features.wind_sector,
     obs_features.wind_speed_kmh,
     obs_features.wind_speed_ms,
+    obs_features.wind_gust_abs_max_ms,
 
     -- visibilité & flags
     obs_features.visibility_m,
@@ -94,21 +111,24 @@ select
     obs_features.temperature_c,
     obs_features.humidity_pct,
     
+    -- Tranches résolues par jointures ASOF (borne basse) : la borne haute
+    -- n'écarte que les valeurs au-delà de la dernière tranche bornée
+
     -- interprétation BI du vent via échelle de Beaufort
-    dim_beaufort.beaufort_level as wind_beaufort,
-    dim_beaufort.beaufort_label as wind_beaufort_label,
+    case when obs_features.wind_speed_ms < dim_beaufort.ms_max then dim_beaufort.beaufort_level end as wind_beaufort,
+    case when obs_features.wind_speed_ms < dim_beaufort.ms_max then dim_beaufort.beaufort_label end as wind_beaufort_label,
 
     -- interprétation BI des précip 24h
-    dim_precip.intensity_level as precip_24h_intensity_level,
-    dim_precip.intensity_label as precip_24h_intensity_label,
+    case when obs_windows.precip_24h_mm <= coalesce(dim_precip.max_mm, 'infinity'::double) then dim_precip.intensity_level end as precip_24h_intensity_level,
+    case when obs_windows.precip_24h_mm <= coalesce(dim_precip.max_mm, 'infinity'::double) then dim_precip.intensity_label end as precip_24h_intensity_label,
 
     -- interprétation BI de la neige 24h
-    dim_snow.intensity_level as snow_24h_intensity_level,
-    dim_snow.intensity_label as snow_24h_intensity_label,
+    case when obs_windows.snow_24h_m <= coalesce(dim_snow.max_m, 'infinity'::double) then dim_snow.intensity_level end as snow_24h_intensity_level,
+    case when obs_windows.snow_24h_m <= coalesce(dim_snow.max_m, 'infinity'::double) then dim_snow.intensity_label end as snow_24h_intensity_label,
 
     -- interprétation BI de la température moyenne 24h
-    dim_temp.intensity_level as temp_24h_intensity_level,
-    dim_temp.intensity_label as temp_24h_intensity_label
+    case when obs_windows.temp_24h_c < coalesce(dim_temp.max_c, 'infinity'::double) then dim_temp.intensity_level end as temp_24h_intensity_level,
+    case when obs_windows.temp_24h_c < coalesce(dim_temp.max_c, 'infinity'::double) then dim_temp.intensity_label end as temp_24h_intensity_label
 
 from obs_windows
 left join obs_features
@@ -117,17 +137,19 @@ left join obs_features
 left join dim_stations
     on obs_windows.station_id = dim_stations.station_id
 
-left join dim_beaufort
-    on obs_features.wind_speed_ms >= dim_beaufort.ms_min and obs_features.wind_speed_ms <  dim_beaufort.ms_max
+-- Tranche de plus grande borne basse <= valeur (au plus une ligne par heure)
+asof left join dim_beaufort
+    on obs_features.wind_speed_ms >= dim_beaufort.ms_min
 
-left join dim_precip
+asof left join dim_precip
     on obs_windows.precip_24h_mm > dim_precip.min_mm
-   and (dim_precip.max_mm is null or obs_windows.precip_24h_mm <= dim_precip.max_mm)
 
-left join dim_snow
+asof left join dim_snow
     on obs_windows.snow_24h_m > dim_snow.min_m
-   and (dim_snow.max_m is null or obs_windows.snow_24h_m <= dim_snow.max_m)
 
-left join dim_temp
-    on obs_windows.temp_24h_c >= coalesce(dim_temp.min_c, obs_windows.temp_24h_c)
-   and (dim_temp.max_c is null or obs_windows.temp_24h_c < dim_temp.max_c)
+asof left join dim_temp
+    on obs_windows.temp_24h_c >= dim_temp.min_c
+{% if not is_incremental() %}
+-- Build complet trié par zone : zone maps DuckDB efficaces sur dept_code
+order by obs_features.dept_code, obs_windows.station_id, obs_windows.validity_time_utc
+{% endif %}
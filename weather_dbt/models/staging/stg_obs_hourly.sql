@@ -1,10 +1,45 @@
 -- models/staging/meteofrance/stg_obs_hourly.sql
-{{ config(materialized='view') }}
+{{ config(
+    materialized='incremental',
+    unique_key=['station_id', 'validity_time_utc', 'production_time_utc'],
+    incremental_strategy='merge',
+    on_schema_change='sync_all_columns'
+) }}
+
+{#- Chaque ligne raw est typée et bornée une seule fois : seules les lignes
+    chargées après le dernier load_time déjà présent sont lues. -#}
+{% set new_rows_filter %}
+    {% if is_incremental() %}
+    where load_time > {{ load_watermark('load_time_utc') }}
+    {% endif %}
+{% endset %}
+
+with source as (
+{% if var('raw_obs_from_landing', false) %}
+    -- Landing Parquet : une observation peut être déposée par plusieurs fetchs
+    select *
+    from {{ source('landing', 'obs_hourly') }}
+    {{ new_rows_filter }}
+    qualify row_number() over (
+        partition by geo_id_insee, validity_time, reference_time
+        order by load_time
+    ) = 1
+{% else %}
+    select *
+    from {{ source('raw', 'obs_hourly') }}
+    {{ new_rows_filter }}
+{% endif %}
+),
 
-with base as (
+base as (
     select
     -- Ids / localisation
         geo_id_insee                                        as station_id,        -- texte ddnnnpp
+        -- '9' -> '09' ; '2A', '971' inchangés (lpad tronquerait '971' en '97')
+        case
+            when length(dept_code) = 1 then '0' || dept_code
+            else dept_code
+        end                                                 as dept_code,
         case 
             when {{ safe_double('lat') }} between -90 and 90 
                 then {{ safe_double('lat') }} 
@@ -85,7 +120,7 @@ with base as (
         {{ safe_double('pres') }}                            as pressure_station_pa,
         {{ safe_double('pmer') }}                            as pressure_sea_pa
 
-    from {{ source('raw', 'obs_hourly') }}
+    from source
 )
 
 select * from base